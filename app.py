@@ -1,14 +1,14 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import json
+import os
 import uuid
-from threading import Thread
-import time
 
 from game import DifferenzlerGame
 from player import LLMPlayerChatGPT, LLMPlayerAnthropic
 from web_player import WebPlayer
 from web_game_manager import WebGameManager
+from telemetry import get_telemetry
 from dotenv import load_dotenv
 
 app = Flask(__name__)
@@ -16,7 +16,7 @@ app.config['SECRET_KEY'] = 'your-secret-key-here'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Global game manager
-game_manager = WebGameManager()
+game_manager = WebGameManager(archive_dir='game_archive')
 
 @app.route('/')
 def index():
@@ -26,6 +26,16 @@ def index():
 def game():
     return render_template('game.html')
 
+@app.route('/api/games')
+def games_metrics():
+    return jsonify(game_manager.metrics())
+
+# Prometheus scrape endpoint for the LLM call telemetry, opt-in
+if os.getenv('JASS_LLM_METRICS'):
+    @app.route('/metrics')
+    def llm_metrics():
+        return Response(get_telemetry().prometheus(), mimetype='text/plain; version=0.0.4')
+
 @socketio.on('connect')
 def handle_connect():
     print(f'Client connected: {request.sid}')
@@ -55,18 +65,15 @@ def handle_start_game(data):
     # Create and start game
     game = DifferenzlerGame(all_players, n_rounds=5)  # 5 rounds per game
     game_id = game_manager.create_game(game, human_player)
+    if game_id is None:
+        emit('error', {'message': 'All tables are busy, please try again in a moment'})
+        return
     
     join_room(game_id)
-    
-    # Start game in a separate thread
-    def run_game():
-        game_manager.start_game(game_id, socketio)
-    
-    thread = Thread(target=run_game)
-    thread.daemon = True
-    thread.start()
-    
     emit('game_started', {'game_id': game_id, 'players': [str(p) for p in all_players]})
+    
+    # Runs as a task on the game manager's event loop
+    game_manager.start_game(game_id, socketio)
 
 @socketio.on('make_guess')
 def handle_make_guess(data):
@@ -85,7 +92,7 @@ def handle_play_card(data):
     card_rank = data.get('card_rank')
     
     if game_manager.handle_card_play(game_id, request.sid, card_suit, card_rank):
-        emit('card_played', {'card_suit': card_suit, 'card_rank': card_rank})
+        emit('card_accepted', {'card_suit': card_suit, 'card_rank': card_rank})
     else:
         emit('error', {'message': 'Invalid card play'})
 
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from game import DifferenzlerGame
+from async_player import make_guess, play_card
+
+
+class AsyncDifferenzlerGame(DifferenzlerGame):
+    """DifferenzlerGame driven by asyncio.
+
+    All guesses of a round are collected concurrently. Players with async
+    ``make_guess``/``play_card`` are awaited directly, blocking players run in
+    ``executor`` (the loop's default thread pool if None).
+    """
+
+    def __init__(self, players, n_rounds=1, executor=None, **kwargs):
+        super().__init__(players, n_rounds=n_rounds, **kwargs)
+        self.executor = executor
+
+    async def _timed_async(self, player, decide):
+        start = time.perf_counter()
+        result = await decide(player, self, self.executor)
+        self.think_time[self.players.index(player)] += time.perf_counter() - start
+        return result
+
+    async def collect_guesses_async(self):
+        await asyncio.gather(
+            *(self._timed_async(player, make_guess) for player in self.players)
+        )
+        for player in self.players:
+            self.record_guess(player)
+
+    async def play_round_async(self):
+        with self.phase("setup"):
+            self.setup_round()
+        with self.phase("deal"):
+            self.deal_cards()
+        with self.phase("guess"):
+            await self.collect_guesses_async()
+
+        player_order = self.players[:]
+        for i in range(self.N_TRICKS):
+            with self.phase(f"trick {i + 1}"):
+                trick = self.start_trick()
+                for player in player_order:
+                    card = await self._timed_async(player, play_card)
+                    self.record_play(trick, player, card)
+                player_order = self.finish_trick(trick, player_order)
+        with self.phase("score"):
+            self.score_players()
+
+    async def play_game_async(self):
+        for _ in range(self.n_rounds):
+            with self.profile_round():
+                await self.play_round_async()
+                self.finish_round()
+        self.finish_game()
+
+    def play_game(self):
+        asyncio.run(self.play_game_async())
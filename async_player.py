@@ -0,0 +1,144 @@
+import asyncio
+from clients import get_async_client
+from telemetry import note_response
+from player import LLMPlayer, Player, parse_card, parse_guess
+from prompt import (
+    get_messages_for_points_guess,
+    get_messages_for_card_choice,
+    to_anthropic,
+)
+
+
+class AsyncPlayer(Player):
+    """Player whose decisions are coroutines, driven by ``AsyncDifferenzlerGame``."""
+
+    async def make_guess(self, game_state):
+        raise NotImplementedError
+
+    async def play_card(self, game_state):
+        raise NotImplementedError
+
+
+async def make_guess(player, game_state, executor=None):
+    """Let any player guess: async players are awaited, blocking ones run in ``executor``."""
+    if asyncio.iscoroutinefunction(player.make_guess):
+        return await player.make_guess(game_state)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, player.make_guess, game_state)
+
+
+async def play_card(player, game_state, executor=None):
+    """Let any player play a card: async players are awaited, blocking ones run in ``executor``."""
+    if asyncio.iscoroutinefunction(player.play_card):
+        return await player.play_card(game_state)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, player.play_card, game_state)
+
+
+class AsyncLLMPlayer(LLMPlayer, AsyncPlayer):
+    """``LLMPlayer`` that awaits its provider; only the request itself differs."""
+
+    @property
+    def client(self):
+        # shared per event loop, so looked up at call time
+        return get_async_client(self.provider)
+
+    async def _request(self, messages):
+        raise NotImplementedError
+
+    async def _complete(self, messages, kind=None, accept=None):
+        prompt_tokens, tokens = self._count_prompt(messages)
+
+        async def call():
+            with self._provider_call(messages, kind, prompt_tokens, tokens) as attempt:
+                return await self.limiter.acall(attempt, tokens)
+
+        if self.cache is None:
+            return await call()
+        return await self.cache.acomplete(
+            self.provider, self.model, messages, self.params, call, accept
+        )
+
+    async def _try_complete(self, messages, kind=None, accept=None):
+        try:
+            return await self._complete(messages, kind, accept)
+        except Exception as exc:
+            return self._gave_up(exc)
+
+    async def make_guess(self, game_state):
+        with game_state.phase("prompt"):
+            messages = get_messages_for_points_guess(game_state, self.hand)
+        answer = await self._try_complete(
+            messages, "guess", lambda a: parse_guess(a) is not None
+        )
+        self.guess = self._guess_from(answer)
+        print(f"{self} guesses {self.guess} points")
+
+    async def play_card(self, game_state):
+        legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
+
+        with game_state.phase("prompt"):
+            messages = get_messages_for_card_choice(game_state, legal_cards, self.hand)
+        answer = await self._try_complete(
+            messages, "card", lambda a: parse_card(a, legal_cards) is not None
+        )
+        card = self._card_from(answer, legal_cards)
+        self.hand.remove(card)
+        return card
+
+
+class AsyncLLMPlayerChatGPT(AsyncLLMPlayer):
+    provider = "openai"
+    label = "ChatGPT"
+
+    def __init__(self, name, openai_model="gpt-4o"):
+        super().__init__(name)
+        self.model = openai_model
+
+    async def _request(self, messages):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **self.params,
+        )
+        note_response(response)
+        return response.choices[0].message.content
+
+
+class AsyncLLMPlayerAnthropic(AsyncLLMPlayer):
+    provider = "anthropic"
+    label = "Anthropic"
+    params = {"max_tokens": 10}
+
+    def __init__(self, name, anthropic_model="claude-3-5-sonnet-latest"):
+        super().__init__(name)
+        self.model = anthropic_model
+
+    async def _request(self, messages):
+        system, messages = to_anthropic(messages)
+        response = await self.client.messages.create(
+            model=self.model,
+            system=system,
+            messages=messages,
+            **self.params,
+        )
+        note_response(response)
+        return response.content[0].text
+
+
+class AsyncLLMPlayerGemma(AsyncLLMPlayer):
+    provider = "ollama"
+    label = "Gemma"
+
+    def __init__(self, name, gemma_model="gemma3:27b"):
+        super().__init__(name)
+        self.model = gemma_model
+
+    async def _request(self, messages):
+        response = await self.client.chat(
+            model=self.model,
+            messages=messages,
+            **self.params,
+        )
+        note_response(response)
+        return response["message"]["content"]
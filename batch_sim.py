@@ -0,0 +1,248 @@
+"""Vectorized Differenzler simulator.
+
+Plays N rounds at once with NumPy: decks are dealt as an ``(N, 36)``
+permutation array, hands are kept as ``(4, N)`` uint64 bitboards (same card
+indices as ``bitboard.py``) and every trick is resolved for the whole batch
+with mask operations and table lookups. Only scripted policies are supported
+(``random``, ``highest``, ``lowest`` for card play, ``random`` or a fixed
+number for guessing).
+
+Usage:
+    python batch_sim.py --rounds 10000000 --policies random random highest lowest
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from bitboard import (
+    ALL_JACKS,
+    CARD_SUIT,
+    LAST_TRICK_BONUS,
+    N_CARDS,
+    POINTS,
+    STRENGTH,
+    SUIT_MASKS,
+)
+
+N_PLAYERS = 4
+N_TRICKS = 9
+MAX_POINTS = 157
+
+ONE = np.uint64(1)
+# index -1 (no leading suit yet) selects the empty mask
+SUIT_MASK_ARRAY = np.array(SUIT_MASKS + [0], dtype=np.uint64)
+JACKS = np.uint64(ALL_JACKS)
+SUIT_OF = np.array(CARD_SUIT, dtype=np.int64)
+STRENGTH_TABLE = np.array(STRENGTH, dtype=np.int16)  # [trump, lead, card]
+POINT_TABLE = np.array(POINTS, dtype=np.int16)  # [trump, card]
+# strength of a card within its own suit, used to rank cards for highest/lowest
+RANK_KEY = STRENGTH_TABLE[:, SUIT_OF, np.arange(N_CARDS)].astype(np.int64)
+
+CARD_POLICIES = ("random", "highest", "lowest")
+
+
+def popcount(masks):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks)
+    masks = masks - ((masks >> ONE) & np.uint64(0x5555555555555555))
+    masks = (masks & np.uint64(0x3333333333333333)) + (
+        (masks >> np.uint64(2)) & np.uint64(0x3333333333333333)
+    )
+    masks = (masks + (masks >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (masks * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def lowest_index(masks):
+    """Index of the lowest set bit of every (non-zero) mask."""
+    low = masks & (~masks + ONE)
+    return np.log2(low.astype(np.float64)).astype(np.int64)
+
+
+def deal(n, rng):
+    """Return ``(decks, trumps)``: an ``(n, 36)`` permutation array and ``(n,)`` trump suits."""
+    decks = rng.permuted(np.tile(np.arange(N_CARDS, dtype=np.int8), (n, 1)), axis=1)
+    trumps = rng.integers(0, 4, size=n, dtype=np.int64)
+    return decks, trumps
+
+
+def hands_from_decks(decks):
+    """Seat ``s`` gets ``deck[9s:9s+9]``, like ``DifferenzlerGame.deal_cards``."""
+    bits = np.left_shift(ONE, decks.astype(np.uint64))
+    return np.stack(
+        [
+            np.bitwise_or.reduce(bits[:, s * N_TRICKS : (s + 1) * N_TRICKS], axis=1)
+            for s in range(N_PLAYERS)
+        ]
+    )
+
+
+def legal_cards(hands, lead, trumps):
+    """Batched version of ``bitboard.legal_mask``; ``lead`` is -1 for the first card."""
+    follow = hands & SUIT_MASK_ARRAY[lead]
+    legal = follow | (hands & SUIT_MASK_ARRAY[trumps])
+    lone_jack = ((legal & (legal - ONE)) == 0) & ((legal & JACKS) != 0)
+    return np.where((lead < 0) | (follow == 0) | lone_jack, hands, legal)
+
+
+def choose_cards(policy, legal, keys, rng):
+    """Pick one card index per legal mask; ``keys`` is ``RANK_KEY`` gathered by trump."""
+    n = legal.shape[0]
+    if policy == "random":
+        skip = (rng.random(n) * popcount(legal)).astype(np.int64)
+        for i in range(N_TRICKS - 1):
+            legal = np.where(skip > i, legal & (legal - ONE), legal)
+        return lowest_index(legal)
+    if policy not in ("highest", "lowest"):
+        raise ValueError(f"Unknown card policy: {policy}")
+    sign = 1 if policy == "highest" else -1
+    rows = np.arange(n)
+    best = np.full(n, -(10**6))
+    choice = np.zeros(n, dtype=np.int64)
+    for _ in range(N_TRICKS):
+        left = legal != 0
+        if not left.any():
+            break
+        index = lowest_index(np.where(left, legal, ONE))
+        key = np.where(left, sign * keys[rows, index], -(10**6))
+        better = key > best
+        best = np.where(better, key, best)
+        choice = np.where(better, index, choice)
+        legal = np.where(left, legal & (legal - ONE), legal)
+    return choice
+
+
+def make_guesses(guess_policies, n, rng):
+    guesses = np.empty((n, N_PLAYERS), dtype=np.int16)
+    for seat, policy in enumerate(guess_policies):
+        if policy == "random":
+            guesses[:, seat] = rng.integers(0, MAX_POINTS + 1, size=n)
+        else:
+            guesses[:, seat] = int(policy)
+    return guesses
+
+
+def play_batch(decks, trumps, policies, rng):
+    """Play one round for every deck and return the ``(n, 4)`` round points."""
+    n = decks.shape[0]
+    rows = np.arange(n)
+    hands = hands_from_decks(decks)
+    keys = RANK_KEY[trumps]
+    points = np.zeros((n, N_PLAYERS), dtype=np.int16)
+    leader = np.zeros(n, dtype=np.int64)
+    seats_by_policy = {
+        policy: [seat for seat, p in enumerate(policies) if p == policy]
+        for policy in set(policies)
+    }
+
+    for trick_num in range(N_TRICKS):
+        trick = np.empty((n, N_PLAYERS), dtype=np.int64)
+        lead = np.full(n, -1, dtype=np.int64)
+        for pos in range(N_PLAYERS):
+            seat = (leader + pos) % N_PLAYERS
+            hand = hands[seat, rows]
+            legal = legal_cards(hand, lead, trumps)
+            if len(seats_by_policy) == 1:
+                choice = choose_cards(policies[0], legal, keys, rng)
+            else:
+                choice = np.empty(n, dtype=np.int64)
+                for policy, seats in seats_by_policy.items():
+                    sel = np.isin(seat, seats)
+                    choice[sel] = choose_cards(policy, legal[sel], keys[sel], rng)
+            hands[seat, rows] = hand & ~np.left_shift(ONE, choice.astype(np.uint64))
+            trick[:, pos] = choice
+            if pos == 0:
+                lead = SUIT_OF[choice]
+
+        strength = STRENGTH_TABLE[trumps[:, None], lead[:, None], trick]
+        winner = (leader + strength.argmax(axis=1)) % N_PLAYERS
+        won = POINT_TABLE[trumps[:, None], trick].sum(axis=1)
+        if trick_num == N_TRICKS - 1:
+            won += LAST_TRICK_BONUS
+        points[rows, winner] += won
+        leader = winner
+    return points
+
+
+def simulate(n, policies, guess_policies=("random",) * N_PLAYERS, seed=None):
+    """Simulate ``n`` rounds; returns a dict of ``(n, 4)`` arrays and the trumps."""
+    rng = np.random.default_rng(seed)
+    decks, trumps = deal(n, rng)
+    points = play_batch(decks, trumps, policies, rng)
+    guesses = make_guesses(guess_policies, n, rng)
+    return {
+        "decks": decks,
+        "trumps": trumps,
+        "points": points,
+        "guesses": guesses,
+        "penalties": np.abs(guesses - points),
+    }
+
+
+def simulate_stats(
+    n_rounds,
+    policies,
+    guess_policies=("random",) * N_PLAYERS,
+    seed=None,
+    chunk_size=100_000,
+):
+    """Simulate ``n_rounds`` in chunks and keep only per-seat histograms.
+
+    Memory stays bounded by ``chunk_size`` so 10^7 rounds and more are fine.
+    """
+    seeds = np.random.SeedSequence(seed).spawn((n_rounds + chunk_size - 1) // chunk_size)
+    point_hist = np.zeros((N_PLAYERS, MAX_POINTS + 1), dtype=np.int64)
+    penalty_hist = np.zeros((N_PLAYERS, MAX_POINTS + 1), dtype=np.int64)
+    done = 0
+    for chunk_seed in seeds:
+        size = min(chunk_size, n_rounds - done)
+        result = simulate(size, policies, guess_policies, chunk_seed)
+        for seat in range(N_PLAYERS):
+            point_hist[seat] += np.bincount(
+                result["points"][:, seat], minlength=MAX_POINTS + 1
+            )
+            penalty_hist[seat] += np.bincount(
+                result["penalties"][:, seat], minlength=MAX_POINTS + 1
+            )
+        done += size
+    return {"rounds": done, "points": point_hist, "penalties": penalty_hist}
+
+
+def summarize(hist):
+    values = np.arange(hist.shape[-1])
+    total = hist.sum()
+    mean = (hist * values).sum() / total
+    std = np.sqrt((hist * (values - mean) ** 2).sum() / total)
+    cdf = np.cumsum(hist) / total
+    quantiles = {q: int(np.searchsorted(cdf, q)) for q in (0.05, 0.25, 0.5, 0.75, 0.95)}
+    return {"mean": float(mean), "std": float(std), "quantiles": quantiles}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch Differenzler simulator")
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument(
+        "--policies", nargs=N_PLAYERS, default=["random"] * N_PLAYERS, choices=CARD_POLICIES
+    )
+    parser.add_argument("--guesses", nargs=N_PLAYERS, default=["random"] * N_PLAYERS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = simulate_stats(
+        args.rounds, args.policies, args.guesses, args.seed, args.chunk_size
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {stats['rounds']} rounds in {elapsed:.1f}s")
+    for seat in range(N_PLAYERS):
+        points = summarize(stats["points"][seat])
+        penalties = summarize(stats["penalties"][seat])
+        print(f"\nSeat {seat + 1} ({args.policies[seat]}, guess {args.guesses[seat]}):")
+        print(f"  Points:  mean {points['mean']:.2f}, std {points['std']:.2f}, quantiles {points['quantiles']}")
+        print(f"  Penalty: mean {penalties['mean']:.2f}, std {penalties['std']:.2f}, quantiles {penalties['quantiles']}")
+
+
+if __name__ == "__main__":
+    main()
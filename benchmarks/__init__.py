@@ -0,0 +1,22 @@
+"""Offline benchmarks for the engine hot paths.
+
+    python -m benchmarks                # run all, compare with the history, save
+    python -m benchmarks -k legal       # only benchmarks whose name contains "legal"
+    python -m benchmarks --no-save --threshold 0.05 --fail
+
+A benchmark is a function registered with ``@benchmark`` that builds its
+inputs from a fixed seed (bots only, no network) and returns the
+zero-argument callable to time. A benchmark whose callable changes its
+inputs returns ``(setup, run)`` instead: ``setup()`` restores them before
+every call of ``run`` and is not timed. Results are kept per machine in
+``benchmarks/history.json``; every run is compared with the median of the
+previous runs on the same machine and anything slower by more than the
+threshold is reported as a regression.
+"""
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    BENCHMARKS[fn.__name__] = fn
+    return fn
@@ -0,0 +1,114 @@
+"""Card, rule and round benchmarks, plus the seeded games the others use."""
+
+import random
+
+from benchmarks import benchmark
+from card import Suit, generate_deck
+from game import DifferenzlerGame
+from player import RandomGuesser
+
+SEED = 1234
+
+
+def seeded_game(seed=SEED):
+    """A bot-only game with seeded players, set up and dealt."""
+    players = [RandomGuesser(f"Bot {i}") for i in range(4)]
+    for i, player in enumerate(players):
+        player.rng.seed(seed + i)
+    game = DifferenzlerGame(players, seed=seed, stats_file=None, verbose=False)
+    game.setup_round()
+    game.deal_cards()
+    return game
+
+
+def mid_round_game(seed=SEED, tricks=4, cards=2):
+    """A seeded game after the guesses, ``tricks`` tricks and ``cards`` cards
+    of the next one. Returns the game, the current trick and the player to move."""
+    game = seeded_game(seed)
+    game.collect_guesses()
+    order = game.players[:]
+    for _ in range(tricks):
+        trick = game.start_trick()
+        for player in order:
+            game.record_play(trick, player, player.play_card(game))
+        order = game.finish_trick(trick, order)
+    trick = game.start_trick()
+    for player in order[:cards]:
+        game.record_play(trick, player, player.play_card(game))
+    return game, trick, order[cards]
+
+
+@benchmark
+def card_strength():
+    deck = generate_deck()
+    contexts = [(trump, lead) for trump in Suit for lead in [None, *Suit]]
+
+    def run():
+        for trump, lead in contexts:
+            for card in deck:
+                card.strength(trump, lead)
+
+    return run
+
+
+@benchmark
+def get_legal_cards():
+    game = seeded_game()
+    hands = [player.hand for player in game.players]
+    leads = [None, *Suit]
+
+    def run():
+        for hand in hands:
+            for lead in leads:
+                game.get_legal_cards(hand, lead)
+
+    return run
+
+
+@benchmark
+def determine_trick_winner():
+    game = seeded_game()
+    rng = random.Random(SEED)
+    deck = generate_deck()
+    tricks = []
+    for _ in range(25):
+        rng.shuffle(deck)
+        tricks.extend(
+            [(player, card) for player, card in zip(game.players, deck[i : i + 4])]
+            for i in range(0, 36, 4)
+        )
+
+    def run():
+        for trick in tricks:
+            game.determine_trick_winner(trick)
+
+    return run
+
+
+@benchmark
+def score_players():
+    game = seeded_game()
+    game.collect_guesses()
+    order = game.players[:]
+    for _ in range(game.N_TRICKS):
+        trick = game.start_trick()
+        for player in order:
+            game.record_play(trick, player, player.play_card(game))
+        order = game.finish_trick(trick, order)
+    points = [player.points for player in game.players]
+    n_events = len(game.log)
+
+    def setup():
+        # scoring adds to the players' points and logs the scores
+        for player, player_points in zip(game.players, points):
+            player.points = player_points
+        for events in (game.log.kinds, game.log.seats, game.log.values):
+            del events[n_events:]
+
+    return setup, game.score_players
+
+
+@benchmark
+def play_round():
+    game = seeded_game()
+    return game.play_round
@@ -0,0 +1,154 @@
+"""Time the registered benchmarks, keep a history and flag regressions."""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from benchmarks import BENCHMARKS
+# register the benchmarks
+from benchmarks import engine, serialization  # noqa: F401
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), "history.json")
+
+
+def machine():
+    """Runs are only compared with runs on the same machine and Python."""
+    return f"{platform.node()} {platform.machine()} Python {platform.python_version()}"
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, repeat=5, min_time=0.2, setup=None):
+    """Best and median seconds per call of ``fn`` over ``repeat`` timings of at least ``min_time``.
+
+    With ``setup``, it is called untimed before every call of ``fn``.
+    """
+    if setup is not None:
+        return _measure_with_setup(fn, setup, repeat, min_time)
+    timer = timeit.Timer(fn)
+    number, taken = timer.autorange()
+    number = max(1, round(number * min_time / taken))
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return min(times), statistics.median(times)
+
+
+def _measure_with_setup(fn, setup, repeat, min_time):
+    times = []
+    # as timeit does
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            taken = calls = 0
+            while taken < min_time:
+                setup()
+                start = time.perf_counter()
+                fn()
+                taken += time.perf_counter() - start
+                calls += 1
+            times.append(taken / calls)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return min(times), statistics.median(times)
+
+
+def load_history(path=DEFAULT_HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(history, path=DEFAULT_HISTORY):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, path)
+
+
+def baselines(history, runs=5):
+    """Median best time per benchmark over the last ``runs`` runs on this machine."""
+    times = {}
+    for run in history:
+        if run["machine"] == machine():
+            for name, result in run["results"].items():
+                times.setdefault(name, []).append(result["best"])
+    return {name: statistics.median(values[-runs:]) for name, values in times.items()}
+
+
+def run_benchmarks(names, repeat=5, min_time=0.2):
+    results = {}
+    # bots print their guesses
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name in names:
+            bench = BENCHMARKS[name]()
+            setup, fn = bench if isinstance(bench, tuple) else (None, bench)
+            best, median = measure(fn, repeat, min_time, setup)
+            results[name] = {"best": best, "median": median}
+    return results
+
+
+def report(results, base, threshold):
+    """The comparison table and the names of the regressed benchmarks."""
+    lines = [f"{'Benchmark':<24} {'Best':>10} {'Median':>10} {'Baseline':>10} {'Change':>8}"]
+    regressions = []
+    for name, result in results.items():
+        line = f"{name:<24} {_us(result['best']):>10} {_us(result['median']):>10}"
+        if name in base:
+            change = result["best"] / base[name] - 1
+            line += f" {_us(base[name]):>10} {change:>+7.1%}"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+            elif change < -threshold:
+                line += "  faster"
+        lines.append(line)
+    return "\n".join(lines), regressions
+
+
+def _us(seconds):
+    return f"{seconds * 1e6:.2f}us"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="only names containing this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--baseline", type=int, default=5, help="runs in the baseline median")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.1 = 10%%")
+    parser.add_argument("--no-save", action="store_true", help="do not add this run to the history")
+    parser.add_argument("--fail", action="store_true", help="exit with 1 on a regression")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    history = load_history(args.history)
+    results = run_benchmarks(names, args.repeat, args.min_time)
+    table, regressions = report(results, baselines(history, args.baseline), args.threshold)
+    print(table)
+    if not args.no_save:
+        history.append(
+            {"time": time.time(), "commit": commit(), "machine": machine(), "results": results}
+        )
+        save_history(history, args.history)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail:
+            sys.exit(1)
@@ -0,0 +1,33 @@
+"""Prompt construction and web card serialization benchmarks."""
+
+from benchmarks import benchmark
+from benchmarks.engine import mid_round_game
+from prompt import get_messages_for_card_choice, get_messages_for_points_guess
+from web_game_manager import WebGameManager
+
+
+@benchmark
+def prompt_points_guess():
+    game, _, player = mid_round_game(tricks=0, cards=0)
+    return lambda: get_messages_for_points_guess(game, player.hand)
+
+
+@benchmark
+def prompt_card_choice():
+    game, _, player = mid_round_game()
+    legal = game.get_legal_cards(player.hand, game.leading_suit)
+    return lambda: get_messages_for_card_choice(game, legal, player.hand)
+
+
+@benchmark
+def web_serialize_state():
+    game, trick, player = mid_round_game()
+    legal = game.get_legal_cards(player.hand, game.leading_suit)
+    manager = WebGameManager()
+
+    def run():
+        manager._serialize_cards(player.hand)
+        manager._serialize_cards(legal)
+        manager._serialize_trick(trick)
+
+    return run
@@ -0,0 +1,183 @@
+"""Bitboard representation of the Differenzler deck.
+
+Every card has a fixed index 0-35 (``suit_index * 9 + rank_index`` in the
+order of ``Suit`` and ``Rank``), so hands, tricks and played cards can be kept
+as plain ``int`` masks. ``Card`` objects are only needed at the edges, via
+``card_index``/``index_card`` and ``cards_to_mask``/``mask_to_cards``.
+"""
+
+from card import (
+    ALL_JACKS,
+    JACK_MASKS,
+    N_CARDS,
+    POINT_TABLE,
+    RANK_INDEX,
+    RANKS,
+    STRENGTH_TABLE,
+    SUIT_INDEX,
+    SUIT_MASKS,
+    SUITS,
+    Card,
+    legal_mask,
+)
+
+FULL_DECK = (1 << N_CARDS) - 1
+LAST_TRICK_BONUS = 5
+
+DECK = [Card(suit, rank) for suit in SUITS for rank in RANKS]
+CARD_SUIT = [i // len(RANKS) for i in range(N_CARDS)]
+
+# STRENGTH[trump][lead][card] is Card.strength, POINTS[trump][card] is
+# Card.point_value.
+STRENGTH = STRENGTH_TABLE
+POINTS = POINT_TABLE
+
+# POINT_MASKS[trump] lists (value, mask) pairs so that the points of any mask
+# are a handful of popcounts instead of a loop over cards.
+POINT_MASKS = []
+for _t in range(4):
+    _groups = {}
+    for _c in range(N_CARDS):
+        if POINTS[_t][_c]:
+            _groups[POINTS[_t][_c]] = _groups.get(POINTS[_t][_c], 0) | (1 << _c)
+    POINT_MASKS.append(sorted(_groups.items(), reverse=True))
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def card_index(card):
+    return card.id
+
+
+def index_card(index):
+    return DECK[index]
+
+
+def cards_to_mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << card_index(card)
+    return mask
+
+
+def iter_indices(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def mask_to_cards(mask):
+    return [DECK[i] for i in iter_indices(mask)]
+
+
+def suit_index(suit):
+    return None if suit is None else SUIT_INDEX[suit]
+
+
+def mask_points(mask, trump):
+    return sum(value * popcount(mask & m) for value, m in POINT_MASKS[trump])
+
+
+def trick_winner(cards, trump):
+    """Return the position (0-3) of the winning card in ``cards``."""
+    strength = STRENGTH[trump][CARD_SUIT[cards[0]]]
+    best = 0
+    for pos in range(1, len(cards)):
+        if strength[cards[pos]] > strength[cards[best]]:
+            best = pos
+    return best
+
+
+class BitboardRound:
+    """State of one round with all hands as masks.
+
+    Seats are numbered 0-3 in playing order; ``leader`` opens the first
+    trick. ``points`` includes the bonus for the last trick, so the points of
+    all seats add up to 157.
+    """
+
+    def __init__(self, hands, trump, leader=0):
+        self.hands = list(hands)
+        self.trump = trump
+        self.leader = leader
+        self.played = 0
+        self.voids = [0] * len(self.hands)
+        self.won = [0] * len(self.hands)
+        self.points = [0] * len(self.hands)
+        self.trick = []
+        self.n_tricks_played = 0
+
+    @property
+    def to_play(self):
+        return (self.leader + len(self.trick)) % len(self.hands)
+
+    @property
+    def leading(self):
+        return CARD_SUIT[self.trick[0]] if self.trick else None
+
+    def legal(self, seat=None):
+        seat = self.to_play if seat is None else seat
+        return legal_mask(self.hands[seat], self.leading, self.trump)
+
+    def play(self, index):
+        seat = self.to_play
+        bit = 1 << index
+        self.hands[seat] ^= bit
+        self.played |= bit
+        leading = self.leading
+        # trumps may always be played, so only a discard shows a void
+        if leading is not None and CARD_SUIT[index] not in (leading, self.trump):
+            self.voids[seat] |= SUIT_MASKS[leading] & ~JACK_MASKS[leading]
+        self.trick.append(index)
+        if len(self.trick) == len(self.hands):
+            self._finish_trick()
+
+    def _finish_trick(self):
+        winner = (self.leader + trick_winner(self.trick, self.trump)) % len(self.hands)
+        trick_mask = 0
+        for index in self.trick:
+            trick_mask |= 1 << index
+        self.won[winner] |= trick_mask
+        self.points[winner] += mask_points(trick_mask, self.trump)
+        self.n_tricks_played += 1
+        if not any(self.hands):
+            self.points[winner] += LAST_TRICK_BONUS
+        self.leader = winner
+        self.trick = []
+
+    def is_over(self):
+        return not any(self.hands) and not self.trick
+
+
+def deal_masks(deck):
+    """Split a shuffled list of 36 card indices into four hand masks."""
+    hands = []
+    for i in range(4):
+        mask = 0
+        for index in deck[i * 9 : (i + 1) * 9]:
+            mask |= 1 << index
+        hands.append(mask)
+    return hands
+
+
+def play_round(hands, trump, policies, leader=0):
+    """Play a full round on masks.
+
+    ``policies[seat](state, legal)`` returns the card index to play. Returns
+    the finished ``BitboardRound``.
+    """
+    state = BitboardRound(hands, trump, leader)
+    while not state.is_over():
+        seat = state.to_play
+        state.play(policies[seat](state, state.legal(seat)))
+    return state
+
+
+def random_policy(rng):
+    def policy(state, legal):
+        return rng.choice(list(iter_indices(legal)))
+
+    return policy
@@ -69,34 +69,83 @@ NON_TRUMP_POINTS = {
 }
 
 
+SUITS = list(Suit)
+RANKS = list(Rank)
+N_CARDS = len(SUITS) * len(RANKS)
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
+# leading suit index of a trick without cards
+NO_LEAD = len(SUITS)
+
+SUIT_MASKS = [((1 << len(RANKS)) - 1) << (s * len(RANKS)) for s in range(len(SUITS))]
+JACK_MASKS = [1 << (s * len(RANKS) + RANK_INDEX[Rank.JACK]) for s in range(len(SUITS))]
+ALL_JACKS = sum(JACK_MASKS)
+
+
+def _strength(card_id, trump, leading):
+    suit, rank = divmod(card_id, len(RANKS))
+    if suit == trump:
+        return 100 + TRUMP_ORDER[RANKS[rank]]
+    elif suit == leading:
+        return 50 + NON_TRUMP_ORDER[RANKS[rank]]
+    else:
+        return NON_TRUMP_ORDER[RANKS[rank]]
+
+
+def _point_value(card_id, trump):
+    suit, rank = divmod(card_id, len(RANKS))
+    return (TRUMP_POINTS if suit == trump else NON_TRUMP_POINTS)[RANKS[rank]]
+
+
+# STRENGTH_TABLE[trump][leading][card id] and POINT_TABLE[trump][card id],
+# with suit indices and NO_LEAD as leading suit before the first card.
+STRENGTH_TABLE = [
+    [[_strength(c, t, l) for c in range(N_CARDS)] for l in range(NO_LEAD + 1)]
+    for t in range(len(SUITS))
+]
+POINT_TABLE = [[_point_value(c, t) for c in range(N_CARDS)] for t in range(len(SUITS))]
+
+
+def legal_mask(hand, leading, trump):
+    """Legal cards of the hand mask ``hand`` as a mask.
+
+    ``leading`` and ``trump`` are suit indices, ``leading`` is None for the
+    first card of a trick. Trump can always be played; a lone jack never
+    has to be played to follow suit.
+    """
+    if leading is None:
+        return hand
+    follow = hand & SUIT_MASKS[leading]
+    if not follow:
+        return hand
+    legal = follow | (hand & SUIT_MASKS[trump])
+    if legal & (legal - 1) == 0 and legal & ALL_JACKS:
+        return hand
+    return legal
+
+
 class Card:
     def __init__(self, suit: Suit, rank: Rank):
         self.suit = suit
         self.rank = rank
+        # index into the tables above, suit_index * 9 + rank_index
+        self.id = SUIT_INDEX[suit] * len(RANKS) + RANK_INDEX[rank]
 
     def __repr__(self):
         return f"{self.rank.name}-{self.suit.name}"
 
     def __eq__(self, other):
-        return self.suit == other.suit and self.rank == other.rank
+        return self.id == other.id
 
     def __hash__(self):
-        return hash((self.suit, self.rank))
+        return self.id
 
     def strength(self, trump: Suit, leading: Suit):
-        if self.suit == trump:
-            return 100 + TRUMP_ORDER[self.rank]
-        elif self.suit == leading:
-            return 50 + NON_TRUMP_ORDER[self.rank]
-        else:
-            return NON_TRUMP_ORDER[self.rank]
+        lead = NO_LEAD if leading is None else SUIT_INDEX[leading]
+        return STRENGTH_TABLE[SUIT_INDEX[trump]][lead][self.id]
 
     def point_value(self, trump: Suit):
-        return (
-            TRUMP_POINTS[self.rank]
-            if self.suit == trump
-            else NON_TRUMP_POINTS[self.rank]
-        )
+        return POINT_TABLE[SUIT_INDEX[trump]][self.id]
 
 
 def generate_deck():
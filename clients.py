@@ -0,0 +1,118 @@
+"""Shared provider clients.
+
+All players in a process share one client per provider and API key (per
+event loop for the async clients), each backed by a pooled httpx client, so
+TCP/TLS connections are kept alive and reused across players, tricks and
+games. Pool sizes and timeouts come from the ``JASS_LLM_*`` environment
+variables or ``configure()``; call ``configure()`` before the first client
+is created. SDK retries are disabled, ``rate_limit`` retries instead.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+from anthropic import Anthropic, AsyncAnthropic
+from ollama import AsyncClient, Client
+from openai import AsyncOpenAI, OpenAI
+
+settings = {
+    "max_connections": int(os.getenv("JASS_LLM_MAX_CONNECTIONS", 100)),
+    "max_keepalive_connections": int(os.getenv("JASS_LLM_MAX_KEEPALIVE", 20)),
+    "keepalive_expiry": float(os.getenv("JASS_LLM_KEEPALIVE_EXPIRY", 60)),
+    "timeout": float(os.getenv("JASS_LLM_TIMEOUT", 120)),
+    "connect_timeout": float(os.getenv("JASS_LLM_CONNECT_TIMEOUT", 10)),
+}
+
+_clients = {}
+# async clients are bound to the event loop they were created on
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    unknown = set(kwargs) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {sorted(unknown)}")
+    settings.update(kwargs)
+
+
+def _http_kwargs():
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(
+            settings["timeout"], connect=settings["connect_timeout"]
+        ),
+    }
+
+
+def _build(provider, api_key, asynchronous):
+    if provider == "openai":
+        if asynchronous:
+            return AsyncOpenAI(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(**_http_kwargs()),
+                max_retries=0,
+            )
+        return OpenAI(
+            api_key=api_key, http_client=httpx.Client(**_http_kwargs()), max_retries=0
+        )
+    if provider == "anthropic":
+        if asynchronous:
+            return AsyncAnthropic(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(**_http_kwargs()),
+                max_retries=0,
+            )
+        return Anthropic(
+            api_key=api_key, http_client=httpx.Client(**_http_kwargs()), max_retries=0
+        )
+    if provider == "ollama":
+        # api_key is the ollama host here
+        return (AsyncClient if asynchronous else Client)(api_key, **_http_kwargs())
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def _default_key(provider):
+    return {
+        "openai": os.getenv("OPENAI_API_KEY"),
+        "anthropic": os.getenv("ANTHROPIC_API_KEY"),
+        "ollama": os.getenv("OLLAMA_HOST"),
+    }.get(provider)
+
+
+def get_client(provider, api_key=None):
+    """Return the shared blocking client for ``provider`` ("openai", "anthropic", "ollama")."""
+    api_key = api_key or _default_key(provider)
+    with _lock:
+        key = (provider, api_key)
+        if key not in _clients:
+            _clients[key] = _build(provider, api_key, asynchronous=False)
+        return _clients[key]
+
+
+def get_async_client(provider, api_key=None):
+    """Return the shared async client for ``provider`` on the running event loop."""
+    api_key = api_key or _default_key(provider)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        key = (provider, api_key)
+        if key not in clients:
+            clients[key] = _build(provider, api_key, asynchronous=True)
+        return clients[key]
+
+
+def stats():
+    """Number of shared clients, for diagnostics."""
+    with _lock:
+        return {
+            "clients": len(_clients),
+            "async_clients": sum(len(c) for c in _async_clients.values()),
+        }
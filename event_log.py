@@ -0,0 +1,143 @@
+"""Append-only event log of a round.
+
+Every event is a (kind, seat, value) triple stored in three compact arrays:
+
+- ``DEAL``: value is the seat's hand as a card mask
+- ``GUESS``: value is the guess
+- ``PLAY``: value is the card index (see ``bitboard.py``)
+- ``TRICK``: seat won the trick, value is its points (with the last-trick bonus)
+- ``SCORE``: value is the seat's points for the round
+
+Views (prose history, compact trick notation, current trick) are rendered on
+demand, and the cards seen so far are kept as a mask, so recording an event
+is O(1) and nothing is copied until a view is asked for.
+"""
+
+from array import array
+
+from bitboard import index_card, mask_to_cards
+
+DEAL, GUESS, PLAY, TRICK, SCORE = range(5)
+EVENT_NAMES = ("deal", "guess", "play", "trick", "score")
+
+
+class RoundLog:
+    def __init__(self, names, trump=None):
+        self.names = [str(name) for name in names]
+        self.trump = trump
+        self.kinds = array("b")
+        self.seats = array("b")
+        self.values = array("q")
+        # cards of the finished tricks, and of those plus the current trick
+        self.played = 0
+        self.seen = 0
+        self.trick_start = 0
+        self.n_tricks = 0
+
+    def _append(self, kind, seat, value):
+        self.kinds.append(kind)
+        self.seats.append(seat)
+        self.values.append(value)
+
+    def deal(self, seat, hand):
+        self._append(DEAL, seat, hand)
+
+    def guess(self, seat, guess):
+        self._append(GUESS, seat, guess)
+
+    def play(self, seat, card):
+        if self.seen == self.played:
+            self.trick_start = len(self.kinds)
+        self.seen |= 1 << card
+        self._append(PLAY, seat, card)
+
+    def trick(self, winner, points):
+        self.played = self.seen
+        self.n_tricks += 1
+        self._append(TRICK, winner, points)
+
+    def score(self, seat, points):
+        self._append(SCORE, seat, points)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return zip(self.kinds, self.seats, self.values)
+
+    def events(self, kind):
+        """(seat, value) of every event of ``kind``, in order."""
+        return [(s, v) for k, s, v in self if k == kind]
+
+    def guesses(self):
+        return dict(self.events(GUESS))
+
+    def scores(self):
+        return dict(self.events(SCORE))
+
+    def current_trick(self):
+        """(seat, card index) of the cards played to the unfinished trick."""
+        if self.seen == self.played:
+            return []
+        return list(zip(self.seats[self.trick_start :], self.values[self.trick_start :]))
+
+    def tricks(self):
+        """Finished tricks as ((seat, card index), ...) plus the winner and points."""
+        tricks, plays = [], []
+        for kind, seat, value in self:
+            if kind == PLAY:
+                plays.append((seat, value))
+            elif kind == TRICK:
+                tricks.append((plays, seat, value))
+                plays = []
+        return tricks
+
+    def points(self):
+        """Points won by every seat so far."""
+        points = [0] * len(self.names)
+        for seat, value in self.events(TRICK):
+            points[seat] += value
+        return points
+
+    def leader(self):
+        """Seat that leads (or led) the current trick."""
+        if self.seen != self.played:
+            return self.seats[self.trick_start]
+        for kind, seat, _ in zip(reversed(self.kinds), reversed(self.seats), reversed(self.values)):
+            if kind == TRICK:
+                return seat
+        return 0
+
+    def played_cards(self):
+        """Cards of the finished tricks in the order they were played."""
+        return [index_card(v) for k, _, v in self if k == PLAY][: 4 * self.n_tricks]
+
+    def seen_cards(self):
+        return mask_to_cards(self.seen)
+
+    def _play_str(self, seat, card):
+        return f"{self.names[seat]} {index_card(card)}"
+
+    def prose(self):
+        """The game history as sentences, one per guess, play and trick."""
+        lines, trick = [], []
+        for kind, seat, value in self:
+            if kind == GUESS:
+                lines.append(f"{self.names[seat]} guessed {value} points\n")
+            elif kind == PLAY:
+                trick.append(index_card(value))
+                lines.append(f"{self.names[seat]} plays {index_card(value)}\n")
+            elif kind == TRICK:
+                lines.append(f"{self.names[seat]} wins the trick: {trick}\n\n")
+                trick = []
+        return "".join(lines)
+
+    def compact(self):
+        """One line per finished trick: the plays, then the winner and its points."""
+        return "\n".join(
+            f"{n}. {', '.join(self._play_str(s, c) for s, c in plays)} -> {self.names[winner]} {points}"
+            for n, (plays, winner, points) in enumerate(self.tricks(), 1)
+        )
+
+    def current_trick_str(self):
+        return ", ".join(self._play_str(s, c) for s, c in self.current_trick())
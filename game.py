@@ -1,151 +1,263 @@
 import random
-from card import Rank, generate_deck, Suit
+import time
+from card import generate_deck, Suit
+from bitboard import (
+    SUIT_INDEX,
+    LAST_TRICK_BONUS,
+    cards_to_mask,
+    legal_mask,
+    mask_points,
+    suit_index,
+    trick_winner,
+)
+from event_log import RoundLog
+from profiling import NO_PHASE
+from results_store import round_rows
 import csv
 import uuid
 
 
 class DifferenzlerGame:
-    def __init__(self, players, n_rounds=1):
-        self.players = players
+    def __init__(
+        self,
+        players,
+        n_rounds=1,
+        seed=None,
+        stats_file="game_stats.csv",
+        verbose=True,
+        results_store=None,
+        deals=None,
+        profiler=None,
+    ):
+        # copy so that games sharing a player list can run side by side
+        self.players = list(players)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # duplicate play: one seed per round for the deck order and trump, so
+        # the same deals can be replayed with the players in another seat order
+        self.deals = deals
+        self.deal_id = None
+        self.deal_rng = self.rng
+        self.stats_file = stats_file
+        self.stats_rows = []
+        # long-format rows, see results_store.py
+        self.results_store = results_store
+        self.result_rows = []
+        self.verbose = verbose
+        # profiling.GameProfiler for per-phase timers, None to skip them
+        self.profiler = profiler
         self.leading_suit = None
         self.n_rounds = n_rounds
         self.rounds_played = 0
         self.n_tricks_played = 0
         self.game_id = str(uuid.uuid4())
-        self.played_cards = []
-        self.history = ""
+        self.current_trick = []
+        self.last_trick_winner = None
         self.N_TRICKS = 9
         self.MAX_POINTS = 157
-        # shuffle the players
-        random.shuffle(self.players)
+        # shuffle the players, unless the seats are fixed for duplicate play
+        if deals is None:
+            self.rng.shuffle(self.players)
+        self.log = RoundLog(self.players)
+        # seconds every seat spent deciding this round
+        self.think_time = [0.0] * len(self.players)
+
+    @property
+    def history(self):
+        return self.log.prose()
+
+    @property
+    def played_cards(self):
+        return self.log.played_cards()
+
+    @property
+    def played_mask(self):
+        return self.log.played
+
+    def phase(self, name):
+        """Context manager timing ``name`` if the game has a profiler."""
+        if self.profiler is None:
+            return NO_PHASE
+        return self.profiler.phase(name)
+
+    def profile_round(self):
+        if self.profiler is None:
+            return NO_PHASE
+        return self.profiler.round(self)
 
     def get_legal_cards(self, hand, leading_suit):
         # trump can always be played; jack suit is the only card that does not have to follow the leading suit
-        legal_cards = set()
-        trump_cards = set([c for c in hand if c.suit == self.trump_suit])
-        legal_cards.update(trump_cards)
-        suit_cards = set([c for c in hand if c.suit == leading_suit])
-        legal_cards.update(suit_cards)
-        if leading_suit is None or (
-            len(legal_cards) == 1 and list(legal_cards)[0].rank == Rank.JACK
-        ):
+        hand_mask = cards_to_mask(hand)
+        legal = legal_mask(
+            hand_mask, suit_index(leading_suit), SUIT_INDEX[self.trump_suit]
+        )
+        if legal == hand_mask:
             return hand
-        if len(suit_cards) == 0 or len(legal_cards) == 0:
-            return hand
-        legal_cards = list(legal_cards)
-        legal_cards.sort(key=lambda c: (c.suit.value, c.rank.value))
-        return legal_cards
+        return [c for c in hand if legal >> c.id & 1]
 
     def deal_cards(self):
-        random.shuffle(self.deck)
+        self.deal_rng.shuffle(self.deck)
         for i, p in enumerate(self.players):
             p.receive_hand(self.deck[i * 9 : (i + 1) * 9])
+            self.log.deal(i, cards_to_mask(p.hand))
 
     def collect_guesses(self):
         for player in self.players:
-            player.make_guess(self)
-            self.history += f"{player} guessed {player.guess} points\n"
+            self._timed(player, player.make_guess)
+            self.record_guess(player)
 
-    def determine_trick_winner(self, trick):
-        def strength(entry):
-            return entry[1].strength(self.trump_suit, self.leading_suit)
+    def _timed(self, player, decide):
+        start = time.perf_counter()
+        result = decide(self)
+        self.think_time[self.players.index(player)] += time.perf_counter() - start
+        return result
 
-        return max(trick, key=strength)[0]
+    def record_guess(self, player):
+        self.log.guess(self.players.index(player), player.guess)
+
+    def determine_trick_winner(self, trick):
+        cards = [card.id for _, card in trick]
+        return trick[trick_winner(cards, SUIT_INDEX[self.trump_suit])][0]
 
     def play_game(self):
         for _ in range(self.n_rounds):
-            self.play_round()
-            self.rounds_played += 1
-            print(f"\n--- Round {_ + 1} complete ---")
-            for player in self.players:
-                print(f"{player}: {player.points} points")
+            with self.profile_round():
+                self.play_round()
+                self.finish_round()
+        self.finish_game()
+
+    def finish_round(self):
+        self.rounds_played += 1
+        self._log(f"\n--- Round {self.rounds_played} complete ---")
+        for player in self.players:
+            self._log(f"{player}: {player.points} points")
+        with self.phase("persist"):
             self.save_stats()
-        print(f"\n--- {self.rounds_played} rounds played ---")
 
-        print("\n--- Game complete ---")
+    def finish_game(self):
+        self._log(f"\n--- {self.rounds_played} rounds played ---")
+
+        self._log("\n--- Game complete ---")
         for player in self.players:
-            print(f"{player}: {player.points} points")
+            self._log(f"{player}: {player.points} points")
 
     def save_stats(self):
         # store the stats points of the players after a round to a csv file
         # csv file has the following structure: game_id, round, player1_name, player1_points, player2_name, player2_points, ...
-        with open("game_stats.csv", "a") as csvfile:
+        row = [self.game_id, self.rounds_played]
+        for player in self.players:
+            row.append(str(player))
+            row.append(player.points)
+        self.stats_rows.append(row)
+        rows = round_rows(self)
+        self.result_rows.extend(rows)
+        if self.results_store is not None:
+            self.results_store.add(rows)
+        if self.stats_file is None:
+            return
+        with open(self.stats_file, "a") as csvfile:
             writer = csv.writer(csvfile)
-            row = [self.game_id, self.rounds_played]
-            for player in self.players:
-                row.append(str(player))
-                row.append(player.points)
             writer.writerow(row)
-        print("Stats saved to game_stats.csv")
+        self._log(f"Stats saved to {self.stats_file}")
 
     def setup_round(self):
         self.n_tricks_played = 0
         self.deck = generate_deck()
-        self.trump_suit = random.choice(list(Suit))
+        if self.deals is not None:
+            deal_seed = self.deals[self.rounds_played]
+            self.deal_id = str(deal_seed)
+            self.deal_rng = random.Random(deal_seed)
+        self.trump_suit = self.deal_rng.choice(list(Suit))
         self.leading_suit = None
-        print(f"\n🎯 Trump Suit: {self.trump_suit.name}")
+        self.current_trick = []
+        self.last_trick_winner = None
+        self.log = RoundLog(self.players, SUIT_INDEX[self.trump_suit])
+        self.think_time = [0.0] * len(self.players)
+        self._log(f"\n🎯 Trump Suit: {self.trump_suit.name}")
 
     def play_round(self):
-        self.setup_round()
-        self.deal_cards()
-        self.collect_guesses()
+        with self.phase("setup"):
+            self.setup_round()
+        with self.phase("deal"):
+            self.deal_cards()
+        with self.phase("guess"):
+            self.collect_guesses()
 
         player_order = self.players[:]
-        for _ in range(self.N_TRICKS):
-            trick = []
-            self.leading_suit = None
-            for player in player_order:
-                card = player.play_card(self)
-                if not self.leading_suit:
-                    self.leading_suit = card.suit
-                print(f"{player} plays {card}")
-                self.history += f"{player} plays {card}\n"
-                trick.append((player, card))
-
-            self.n_tricks_played += 1
-            # the winner of the last trick gets an extra 5 points
-            if self._is_last_trick():
-                self.players[player_order.index(player)].points += 5
-                print(f"{player} gets an extra 5 points for the last trick")
-            winner = self.determine_trick_winner(trick)
-            winner.tricks_won.append([card for _, card in trick])
-            self.played_cards.extend(card for _, card in trick)
-            self.played_cards = list(set(self.played_cards))
-            print(f"{winner} wins the trick: {[c for _, c in trick]}\n\n")
-            self.history += f"{winner} wins the trick: {[c for _, c in trick]}\n\n"
-            winner_index = player_order.index(winner)
-            player_order = player_order[winner_index:] + player_order[:winner_index]
-            print(f"player order: {[p for p in player_order]}")
-        self.score_players()
-        self.history = ""
+        for i in range(self.N_TRICKS):
+            with self.phase(f"trick {i + 1}"):
+                trick = self.start_trick()
+                for player in player_order:
+                    card = self._timed(player, player.play_card)
+                    self.record_play(trick, player, card)
+                player_order = self.finish_trick(trick, player_order)
+        with self.phase("score"):
+            self.score_players()
+
+    def start_trick(self):
+        """Begin a new trick and return it; plays are appended as (player, card)."""
+        self.leading_suit = None
+        self.current_trick = []
+        return self.current_trick
+
+    def record_play(self, trick, player, card):
+        if not self.leading_suit:
+            self.leading_suit = card.suit
+        self._log(f"{player} plays {card}")
+        self.log.play(self.players.index(player), card.id)
+        trick.append((player, card))
+
+    def finish_trick(self, trick, player_order):
+        """Resolve a complete trick and return the player order for the next one."""
+        self.n_tricks_played += 1
+        winner = self.determine_trick_winner(trick)
+        winner.tricks_won.append([card for _, card in trick])
+        points = mask_points(
+            cards_to_mask(card for _, card in trick), SUIT_INDEX[self.trump_suit]
+        )
+        # the winner of the last trick gets an extra 5 points
+        if self._is_last_trick():
+            self.last_trick_winner = winner
+            points += LAST_TRICK_BONUS
+            self._log(f"{winner} gets an extra 5 points for the last trick")
+        self.log.trick(self.players.index(winner), points)
+        self._log(f"{winner} wins the trick: {[c for _, c in trick]}\n\n")
+        winner_index = player_order.index(winner)
+        player_order = player_order[winner_index:] + player_order[:winner_index]
+        self._log(f"player order: {[p for p in player_order]}")
+        return player_order
+
+    def round_points(self, player):
+        points = mask_points(
+            cards_to_mask(card for trick in player.tricks_won for card in trick),
+            SUIT_INDEX[self.trump_suit],
+        )
+        if player is self.last_trick_winner:
+            points += LAST_TRICK_BONUS
+        return points
 
     def _assert_total_score(self):
-        total_points = 0
-        for player in self.players:
-            total_points += sum(
-                card.point_value(self.trump_suit)
-                for trick in player.tricks_won
-                for card in trick
-            )
+        total_points = sum(self.round_points(player) for player in self.players)
         assert (
             total_points == self.MAX_POINTS
         ), f"Total points: {total_points} != {self.MAX_POINTS}"
 
     def score_players(self):
         for player in self.players:
-            total_points = sum(
-                card.point_value(self.trump_suit)
-                for trick in player.tricks_won
-                for card in trick
-            )
+            total_points = self.round_points(player)
             player.update_points(total_points)
+            self.log.score(self.players.index(player), total_points)
             diff = abs(player.guess - total_points)
-            print(f"\n--- {player}'s score ---")
-            print(f"\n{player}:")
-            print(f"  Guessed: {player.guess}")
-            print(f"  Actual: {total_points}")
-            print(f"  Difference (score): {diff}")
-            print(f"  Points: {player.points}")
+            self._log(f"\n--- {player}'s score ---")
+            self._log(f"\n{player}:")
+            self._log(f"  Guessed: {player.guess}")
+            self._log(f"  Actual: {total_points}")
+            self._log(f"  Difference (score): {diff}")
+            self._log(f"  Points: {player.points}")
+
+    def _log(self, message=""):
+        if self.verbose:
+            print(message)
 
     def _is_last_trick(self):
         return self.n_tricks_played == self.N_TRICKS
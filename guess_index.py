@@ -0,0 +1,288 @@
+"""Expected-points index for fast, calibrated guesses.
+
+``build_index`` plays many rounds with ``batch_sim`` and records the points
+every dealt hand took, keyed by its canonical form: the trump suit's rank
+pattern first, then the three side suits' patterns sorted, so hands that
+only differ by a permutation of the side suits share an entry. Per key the
+count, mean and variance of the points are stored in an open-addressing
+hash table; the same statistics per feature bucket (top trumps, number of
+trumps, aces, tens, card points) back up keys with few or no samples, empty
+buckets taking the values of the nearest filled one.
+
+The index is a directory of ``.npy`` files that ``GuessIndex`` opens
+memory-mapped, so loading is instant and a lookup is a couple of array
+reads. Build it once with
+
+    python guess_index.py --rounds 10000000 --out guess_index
+"""
+
+import argparse
+import functools
+import json
+import os
+import time
+
+import numpy as np
+
+import batch_sim
+from bitboard import RANK_INDEX, RANKS, SUIT_INDEX, cards_to_mask
+from card import NON_TRUMP_POINTS, TRUMP_POINTS, Rank
+from player import RandomGuesser
+
+EMPTY = np.uint64(2**64 - 1)
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+PATTERN = 0x1FF  # the nine ranks of one suit
+
+# tables over all 512 rank patterns of a suit
+_patterns = np.arange(PATTERN + 1)
+_bits = (_patterns[:, None] >> np.arange(len(RANKS))) & 1
+POP9 = _bits.sum(axis=1)
+TRUMP_PATTERN_POINTS = _bits @ np.array([TRUMP_POINTS[r] for r in RANKS])
+SIDE_PATTERN_POINTS = _bits @ np.array([NON_TRUMP_POINTS[r] for r in RANKS])
+
+JACK, NINE, TEN, ACE = (RANK_INDEX[r] for r in (Rank.JACK, Rank.NINE, Rank.TEN, Rank.ACE))
+# trump jack, nine and ace, number of trumps, side aces, side tens, points // 8
+BUCKET_SHAPE = (2, 2, 2, 10, 4, 4, 21)
+BUCKET_WEIGHTS = np.array([4, 3, 2, 1, 2, 1, 1])
+N_BUCKETS = int(np.prod(BUCKET_SHAPE))
+
+
+def canonical_key(hand, trump):
+    """Canonical key of a hand mask for a trump suit index."""
+    patterns = [(hand >> (9 * s)) & PATTERN for s in range(4)]
+    side = sorted((patterns[s] for s in range(4) if s != trump), reverse=True)
+    return patterns[trump] << 27 | side[0] << 18 | side[1] << 9 | side[2]
+
+
+def canonical_keys(hands, trumps):
+    """``canonical_key`` for arrays of hand masks and trump suit indices."""
+    patterns = np.stack(
+        [((hands >> np.uint64(9 * s)) & np.uint64(PATTERN)).astype(np.int64) for s in range(4)],
+        axis=1,
+    )
+    rows = np.arange(len(hands))
+    trump_patterns = patterns[rows, trumps]
+    patterns[rows, trumps] = -1
+    side = -np.sort(-patterns, axis=1)
+    return (
+        trump_patterns << 27 | side[:, 0] << 18 | side[:, 1] << 9 | side[:, 2]
+    ).astype(np.uint64)
+
+
+def bucket_ids(keys):
+    """Feature bucket of canonical keys (an int or an array)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    trump = keys >> 27 & PATTERN
+    side = [keys >> shift & PATTERN for shift in (18, 9, 0)]
+    points = TRUMP_PATTERN_POINTS[trump] + sum(SIDE_PATTERN_POINTS[s] for s in side)
+    features = (
+        trump >> JACK & 1,
+        trump >> NINE & 1,
+        trump >> ACE & 1,
+        POP9[trump],
+        sum(s >> ACE & 1 for s in side),
+        sum(s >> TEN & 1 for s in side),
+        np.minimum(points // 8, BUCKET_SHAPE[-1] - 1),
+    )
+    return np.ravel_multi_index(features, BUCKET_SHAPE)
+
+
+def _slots(keys, bits):
+    return (keys * np.uint64(HASH_MULTIPLIER)) >> np.uint64(64 - bits)
+
+
+def _hash_table(keys, stats, load_factor=0.5):
+    """Lay out unique ``keys`` and their ``stats`` rows with linear probing."""
+    bits = max(4, int(np.ceil(np.log2(max(1, len(keys)) / load_factor))))
+    size = 1 << bits
+    table = np.full(size, EMPTY, dtype=np.uint64)
+    values = np.zeros((size, stats.shape[1]), dtype=np.float32)
+    pending = np.arange(len(keys))
+    slots = _slots(keys, bits).astype(np.int64)
+    while len(pending):
+        free = table[slots[pending]] == EMPTY
+        # of the keys that want the same free slot, the first one gets it
+        taken, first = np.unique(slots[pending[free]], return_index=True)
+        winners = pending[free][first]
+        table[taken] = keys[winners]
+        values[taken] = stats[winners]
+        placed = np.zeros(len(keys), dtype=bool)
+        placed[winners] = True
+        pending = pending[~placed[pending]]
+        slots[pending] = (slots[pending] + 1) & (size - 1)
+    return table, values
+
+
+def _stats(count, total, total_sq):
+    count = np.asarray(count, dtype=np.float64)
+    mean = np.divide(total, count, out=np.zeros_like(count), where=count > 0)
+    var = np.divide(total_sq, count, out=np.zeros_like(count), where=count > 0) - mean**2
+    return np.stack([count, mean, np.maximum(var, 0)], axis=1)
+
+
+def _fill_empty_buckets(buckets):
+    """Give every empty bucket the statistics of its nearest filled bucket."""
+    coords = np.indices(BUCKET_SHAPE).reshape(len(BUCKET_SHAPE), -1).T
+    filled = np.flatnonzero(buckets[:, 0] > 0)
+    empty = np.flatnonzero(buckets[:, 0] == 0)
+    if not len(filled):
+        return buckets
+    for start in range(0, len(empty), 1024):
+        chunk = empty[start : start + 1024]
+        distance = (
+            np.abs(coords[chunk, None, :] - coords[None, filled, :]) * BUCKET_WEIGHTS
+        ).sum(axis=2)
+        buckets[chunk, 1:] = buckets[filled[distance.argmin(axis=1)], 1:]
+    return buckets
+
+
+def build_index(
+    path="guess_index",
+    n_rounds=1_000_000,
+    policies=("random",) * batch_sim.N_PLAYERS,
+    seed=None,
+    chunk_size=100_000,
+    prior_weight=10,
+):
+    """Simulate ``n_rounds`` rounds and write the index to the directory ``path``."""
+    start = time.perf_counter()
+    n_chunks = (n_rounds + chunk_size - 1) // chunk_size
+    parts = []
+    bucket_sums = np.zeros((3, N_BUCKETS))
+    done = 0
+    for chunk_seed in np.random.SeedSequence(seed).spawn(n_chunks):
+        size = min(chunk_size, n_rounds - done)
+        rng = np.random.default_rng(chunk_seed)
+        decks, trumps = batch_sim.deal(size, rng)
+        points = batch_sim.play_batch(decks, trumps, list(policies), rng)
+        hands = batch_sim.hands_from_decks(decks)
+        # every seat's hand is a sample: seat-major like ``hands``
+        keys = canonical_keys(hands.ravel(), np.tile(trumps, batch_sim.N_PLAYERS))
+        values = points.T.ravel().astype(np.float64)
+
+        buckets = bucket_ids(keys)
+        bucket_sums[0] += np.bincount(buckets, minlength=N_BUCKETS)
+        bucket_sums[1] += np.bincount(buckets, values, minlength=N_BUCKETS)
+        bucket_sums[2] += np.bincount(buckets, values**2, minlength=N_BUCKETS)
+
+        unique, inverse = np.unique(keys, return_inverse=True)
+        parts.append(
+            (
+                unique,
+                np.bincount(inverse),
+                np.bincount(inverse, values),
+                np.bincount(inverse, values**2),
+            )
+        )
+        done += size
+
+    keys, inverse = np.unique(np.concatenate([p[0] for p in parts]), return_inverse=True)
+    sums = [np.bincount(inverse, np.concatenate([p[i] for p in parts])) for i in (1, 2, 3)]
+    table, values = _hash_table(keys, _stats(*sums))
+    buckets = _fill_empty_buckets(_stats(*bucket_sums).astype(np.float32))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "keys.npy"), table)
+    np.save(os.path.join(path, "stats.npy"), values)
+    np.save(os.path.join(path, "buckets.npy"), buckets)
+    meta = {
+        "rounds": done,
+        "hands": int(sums[0].sum()),
+        "keys": len(keys),
+        "policies": list(policies),
+        "seed": seed,
+        "prior_weight": prior_weight,
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class GuessIndex:
+    """Read-only view of an index written by ``build_index``."""
+
+    def __init__(self, path="guess_index"):
+        self.path = path
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.stats = np.load(os.path.join(path, "stats.npy"), mmap_mode="r")
+        self.buckets = np.load(os.path.join(path, "buckets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.bits = len(self.keys).bit_length() - 1
+        self.prior_weight = self.meta["prior_weight"]
+
+    def _find(self, key):
+        mask = len(self.keys) - 1
+        slot = ((key * HASH_MULTIPLIER) & (2**64 - 1)) >> (64 - self.bits)
+        while True:
+            stored = self.keys[slot]
+            if stored == key:
+                return slot
+            if stored == EMPTY:
+                return None
+            slot = (slot + 1) & mask
+
+    def lookup(self, hand, trump):
+        """Return (mean, std, samples) of the points of a hand mask with a trump suit index.
+
+        The mean and variance of the hand itself are shrunk towards those of
+        its feature bucket, with the bucket weighing ``prior_weight`` samples.
+        """
+        key = canonical_key(hand, trump)
+        _, bucket_mean, bucket_var = self.buckets[int(bucket_ids(key))]
+        slot = self._find(key)
+        count, mean, var = (0.0, 0.0, 0.0) if slot is None else self.stats[slot]
+        weight = count + self.prior_weight
+        mean = (count * mean + self.prior_weight * bucket_mean) / weight
+        var = (count * var + self.prior_weight * bucket_var) / weight
+        return float(mean), float(np.sqrt(var)), int(count)
+
+    def expected_points(self, cards, trump_suit):
+        return self.lookup(cards_to_mask(cards), SUIT_INDEX[trump_suit])[0]
+
+    def guess(self, cards, trump_suit):
+        return int(round(self.expected_points(cards, trump_suit)))
+
+
+@functools.lru_cache(maxsize=None)
+def load_index(path="guess_index"):
+    """Shared ``GuessIndex`` per path."""
+    return GuessIndex(path)
+
+
+class IndexGuesser(RandomGuesser):
+    """Guesses the expected points of its hand from the index; plays randomly."""
+
+    def __init__(self, name, path="guess_index"):
+        super().__init__(name)
+        self.path = path
+
+    def make_guess(self, game_state):
+        self.guess = load_index(self.path).guess(self.hand, game_state.trump_suit)
+        print(f"{self} guesses {self.guess} points")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the expected-points guess index")
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--out", default="guess_index")
+    parser.add_argument(
+        "--policies",
+        nargs=batch_sim.N_PLAYERS,
+        default=["random"] * batch_sim.N_PLAYERS,
+        choices=batch_sim.CARD_POLICIES,
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    meta = build_index(args.out, args.rounds, args.policies, args.seed, args.chunk_size)
+    print(
+        f"Indexed {meta['hands']} hands ({meta['keys']} distinct) from "
+        f"{meta['rounds']} rounds in {meta['seconds']}s -> {args.out}/"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Information-set Monte Carlo tree search player.
+
+``ISMCTSPlayer`` only sees what a human at the table sees: its own hand, the
+cards played so far and the guesses. Every iteration samples a deal of the
+unseen cards that is consistent with the play so far (hand sizes and the
+voids players have shown by discarding), walks the shared tree over the
+moves legal in that deal, and finishes the round with random play on the
+bitboard engine. Each seat is rewarded for ending close to its own guess.
+
+The search runs for ``budget`` seconds (or a fixed number of ``iterations``)
+per decision. With ``workers`` > 1 independent trees are searched in a
+process pool and their root visit counts are added up.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import (
+    CARD_SUIT,
+    FULL_DECK,
+    JACK_MASKS,
+    SUIT_INDEX,
+    SUIT_MASKS,
+    BitboardRound,
+    cards_to_mask,
+    index_card,
+    iter_indices,
+    popcount,
+)
+from player import Player
+
+MAX_POINTS = 157
+
+
+class Observation:
+    """What one seat knows about a round in progress, as masks (picklable)."""
+
+    def __init__(self, game, player):
+        log = game.log
+        self.seat = game.players.index(player)
+        self.hand = cards_to_mask(player.hand)
+        self.trump = SUIT_INDEX[game.trump_suit]
+        self.guesses = [p.guess for p in game.players]
+        self.points = log.points()
+        self.n_tricks_played = log.n_tricks
+        current = log.current_trick()
+        self.trick = [card for _, card in current]
+        self.leader = log.leader()
+        self.played = log.seen
+        self.voids = [0] * 4
+        self.sizes = [9 - self.n_tricks_played] * 4
+        for plays in [plays for plays, _, _ in log.tricks()] + [current]:
+            if not plays:
+                continue
+            leading = CARD_SUIT[plays[0][1]]
+            for seat, index in plays:
+                if CARD_SUIT[index] not in (leading, self.trump):
+                    self.voids[seat] |= SUIT_MASKS[leading] & ~JACK_MASKS[leading]
+        for pos in range(len(self.trick)):
+            self.sizes[(self.leader + pos) % 4] -= 1
+
+    def unseen(self):
+        return FULL_DECK & ~self.played & ~self.hand
+
+
+def determinize(obs, rng, tries=20):
+    """Deal the unseen cards to the other seats, respecting their voids."""
+    unseen = list(iter_indices(obs.unseen()))
+    others = [s for s in range(4) if s != obs.seat]
+    unseen_mask = obs.unseen()
+    # seats with the fewest possible cards pick first
+    others.sort(key=lambda s: popcount(unseen_mask & ~obs.voids[s]))
+    for attempt in range(tries + 1):
+        rng.shuffle(unseen)
+        hands = [0] * 4
+        hands[obs.seat] = obs.hand
+        left = unseen_mask
+        for seat in others:
+            # last resort: ignore the voids rather than fail
+            voids = obs.voids[seat] if attempt < tries else 0
+            chosen = [c for c in unseen if left >> c & 1 and not voids >> c & 1]
+            if len(chosen) < obs.sizes[seat]:
+                break
+            for card in chosen[: obs.sizes[seat]]:
+                hands[seat] |= 1 << card
+                left ^= 1 << card
+        else:
+            return hands
+    raise ValueError("cannot deal the unseen cards")
+
+
+def _round(obs, hands):
+    state = BitboardRound(hands, obs.trump, obs.leader)
+    state.played = obs.played
+    state.points = list(obs.points)
+    state.trick = list(obs.trick)
+    state.n_tricks_played = obs.n_tricks_played
+    return state
+
+
+def rewards(obs, state):
+    """Reward of every seat: 1 for hitting its guess, 0 for missing by 157."""
+    return [1 - abs(guess - points) / MAX_POINTS for guess, points in zip(obs.guesses, state.points)]
+
+
+class Node:
+    __slots__ = ("seat", "children", "visits", "available", "total")
+
+    def __init__(self, seat=None):
+        self.seat = seat
+        self.children = {}
+        self.visits = 0
+        self.available = 0
+        self.total = 0.0
+
+
+def _ucb(node, exploration):
+    return node.total / node.visits + exploration * math.sqrt(
+        math.log(node.available) / node.visits
+    )
+
+
+def search(obs, budget=0.1, iterations=None, seed=None, exploration=0.7):
+    """Run ISMCTS from ``obs`` and return the visit count of every root move."""
+    rng = random.Random(seed)
+    root = Node()
+    deadline = time.monotonic() + budget
+    done = 0
+    while (done < iterations) if iterations else (time.monotonic() < deadline or not done):
+        done += 1
+        state = _round(obs, determinize(obs, rng))
+        node, path = root, []
+
+        # selection over the moves legal in this deal, expanding one of them
+        while not state.is_over():
+            legal = list(iter_indices(state.legal()))
+            for c in legal:
+                if c in node.children:
+                    node.children[c].available += 1
+            untried = [c for c in legal if c not in node.children]
+            if untried:
+                card = rng.choice(untried)
+                child = node.children[card] = Node(state.to_play)
+                child.available = 1
+                path.append(child)
+                state.play(card)
+                break
+            card = max(legal, key=lambda c: _ucb(node.children[c], exploration))
+            node = node.children[card]
+            path.append(node)
+            state.play(card)
+
+        # random playout
+        while not state.is_over():
+            state.play(rng.choice(list(iter_indices(state.legal()))))
+
+        result = rewards(obs, state)
+        for node in path:
+            node.visits += 1
+            node.total += result[node.seat]
+    return {card: child.visits for card, child in root.children.items()}
+
+
+def expected_points(obs, budget=0.1, iterations=None, seed=None):
+    """Mean points of ``obs.seat`` over random deals and random play."""
+    rng = random.Random(seed)
+    deadline = time.monotonic() + budget
+    total = done = 0
+    while (done < iterations) if iterations else (time.monotonic() < deadline or not done):
+        state = _round(obs, determinize(obs, rng))
+        while not state.is_over():
+            state.play(rng.choice(list(iter_indices(state.legal()))))
+        total += state.points[obs.seat]
+        done += 1
+    return total / done
+
+
+# one pool per worker count, shared by all players of the process; a pool
+# is never replaced, as players in other threads may be submitting to it
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[workers]
+
+
+class ISMCTSPlayer(Player):
+    def __init__(self, name, budget=0.1, iterations=None, workers=None, exploration=0.7):
+        super().__init__(name)
+        self.budget = budget
+        self.iterations = iterations
+        self.workers = workers or os.cpu_count()
+        self.exploration = exploration
+
+    def _run(self, fn, obs, **kwargs):
+        """Run ``fn`` once per worker with its own seed and return the results."""
+        seeds = [self.rng.getrandbits(64) for _ in range(self.workers)]
+        iterations = self.iterations and -(-self.iterations // self.workers)
+        if self.workers == 1 or multiprocessing.parent_process() is not None:
+            # no nested pools in tournament workers: run every share here
+            budget = self.budget / self.workers
+            return [
+                fn(obs, budget=budget, iterations=iterations, seed=seed, **kwargs)
+                for seed in seeds
+            ]
+        pool = _get_pool(self.workers)
+        futures = [
+            pool.submit(fn, obs, budget=self.budget, iterations=iterations, seed=seed, **kwargs)
+            for seed in seeds
+        ]
+        return [f.result() for f in futures]
+
+    def make_guess(self, game_state):
+        obs = Observation(game_state, self)
+        results = self._run(expected_points, obs)
+        self.guess = round(sum(results) / len(results))
+        print(f"{self} guesses {self.guess} points")
+
+    def play_card(self, game_state):
+        legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
+        if len(legal_cards) == 1:
+            card = legal_cards[0]
+        else:
+            visits = {}
+            obs = Observation(game_state, self)
+            for result in self._run(search, obs, exploration=self.exploration):
+                for index, count in result.items():
+                    visits[index] = visits.get(index, 0) + count
+            card = index_card(max(visits, key=visits.get))
+        self.hand.remove(card)
+        return card
+
+    def __repr__(self):
+        return self.name
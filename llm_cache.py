@@ -0,0 +1,183 @@
+"""Persistent LLM response cache.
+
+Responses are stored in a local SQLite file, keyed by a hash of
+(provider, model, prompt, sampling params). Modes:
+
+- ``off``: always call the provider.
+- ``auto``: serve hits, call the provider on misses and store the answer.
+- ``record``: always call the provider and store (overwrite) the answer.
+- ``replay``: serve only from the cache, a miss raises ``CacheMiss``.
+
+The default cache used by the LLM players is configured with the
+``JASS_LLM_CACHE_MODE`` and ``JASS_LLM_CACHE_PATH`` environment variables.
+Combined with seeded games this makes whole tournaments replayable without
+any API calls. Only answers the caller accepts (e.g. that parse as a legal
+move) are stored, so a bad or empty answer is asked again next time.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MODES = ("off", "auto", "record", "replay")
+DEFAULT_PATH = "llm_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMiss(KeyError):
+    pass
+
+
+class LLMCache:
+    def __init__(self, path=DEFAULT_PATH, mode="auto", max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT,
+                size INTEGER,
+                created REAL,
+                last_used REAL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self._conn.commit()
+        self._size = self._total_size()
+
+    @staticmethod
+    def make_key(provider, model, prompt, params=None):
+        payload = json.dumps(
+            [provider, model, prompt, params or {}], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, provider, model, response):
+        size = len(key) + len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, size, now, now),
+            )
+            self._conn.commit()
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _total_size(self):
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def _evict(self):
+        # other processes may share the file, so start from the real size
+        self._size = self._total_size()
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._conn.commit()
+
+    def _lookup(self, provider, model, prompt, params, accept):
+        key = self.make_key(provider, model, prompt, params)
+        if self.mode in ("auto", "replay"):
+            response = self.get(key)
+            # replay serves what was recorded; auto asks again for an answer
+            # that is no longer accepted
+            if response is not None and (self.mode == "replay" or _accepted(response, accept)):
+                self.hits += 1
+                return key, response
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached {provider} {model} response for key {key}")
+        return key, None
+
+    def complete(self, provider, model, prompt, params, call, accept=None):
+        """Return the response for ``prompt``, calling ``call()`` on a miss.
+
+        A new response is stored only if it is not None and ``accept(response)``
+        (if given) is true.
+        """
+        if self.mode == "off":
+            return call()
+        key, response = self._lookup(provider, model, prompt, params, accept)
+        if response is None:
+            response = call()
+            if _accepted(response, accept):
+                self.put(key, provider, model, response)
+        return response
+
+    async def acomplete(self, provider, model, prompt, params, call, accept=None):
+        """Async version of ``complete``; ``call()`` returns an awaitable."""
+        if self.mode == "off":
+            return await call()
+        key, response = self._lookup(provider, model, prompt, params, accept)
+        if response is None:
+            response = await call()
+            if _accepted(response, accept):
+                self.put(key, provider, model, response)
+        return response
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _accepted(response, accept):
+    return response is not None and (accept is None or accept(response))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Return the process-wide cache configured by the environment, or None."""
+    global _default_cache
+    mode = os.getenv("JASS_LLM_CACHE_MODE", "off")
+    if mode == "off":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                os.getenv("JASS_LLM_CACHE_PATH", DEFAULT_PATH),
+                mode,
+                int(os.getenv("JASS_LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _default_cache
@@ -1,4 +1,3 @@
-from game import DifferenzlerGame
 from player import (
     RandomGuesser,
     HumanPlayer,
@@ -7,24 +6,38 @@ from player import (
     LLMPlayerChatGPT,
     LLMPlayerGemma,
 )
+from profiling import GameProfiler
+from ratings import update_ratings
+from scheduler import AdaptiveTournament
+from telemetry import get_telemetry
+from tournament import PlayerSpec
 from dotenv import load_dotenv
 
 
 def main():
     load_dotenv("secrets.env")
     players = [
-        # HumanPlayer("Human"),
-        # LLMPlayerGemma("Gemma"),
-        LLMPlayerChatGPT("ChatGPT", "gpt-4.1-2025-04-14"),
-        LLMPlayerChatGPT("ChatGPT", "o4-mini-2025-04-16"),
-        LLMPlayerAnthropic("Anthropic", "claude-3-7-sonnet-20250219"),
-        LLMPlayerChatGPT("ChatGPT", "gpt-4o-2024-05-13"),
-        # LLMPlayerChatGPT("o3-mini", "o3-mini"),
+        # PlayerSpec(LLMPlayerGemma, "Gemma"),
+        PlayerSpec(LLMPlayerChatGPT, "ChatGPT", "gpt-4.1-2025-04-14"),
+        PlayerSpec(LLMPlayerChatGPT, "ChatGPT", "o4-mini-2025-04-16"),
+        PlayerSpec(LLMPlayerAnthropic, "Anthropic", "claude-3-7-sonnet-20250219"),
+        PlayerSpec(LLMPlayerChatGPT, "ChatGPT", "gpt-4o-2024-05-13"),
+        # PlayerSpec(LLMPlayerChatGPT, "o3-mini", "o3-mini"),
     ]
-    n_games = 4
-    for i in range(n_games):
-        game = DifferenzlerGame(players, n_rounds=1)
-        game.play_game()
+    # ratings of all earlier tournaments, updated live with this one
+    ratings = update_ratings()
+    # duplicate games until every pair of players is ordered at the 5% level
+    # or the budget is spent
+    # per-phase timers; GameProfiler(cprofile_dir="profiles", trace_memory=True) for more
+    profiler = GameProfiler()
+    tournament = AdaptiveTournament(
+        players, alpha=0.05, max_games=40, ratings=ratings, profiler=profiler
+    )
+    tournament.run()
+    print(tournament.report())
+    print(ratings.report())
+    print(profiler.report())
+    print(get_telemetry().report())
 
 
 if __name__ == "__main__":
@@ -1,12 +1,40 @@
-import os
 import random
-from openai import OpenAI
-from anthropic import Anthropic
-from prompt import get_prompt_for_points_guess, get_prompt_for_card_choice
-from ollama import chat
+from contextlib import contextmanager
+from clients import get_client
+from prompt import (
+    get_messages_for_points_guess,
+    get_messages_for_card_choice,
+    to_anthropic,
+    token_report,
+)
+from llm_cache import get_default_cache
+from rate_limit import get_limiter, is_retryable
+from telemetry import get_telemetry, note_response
 from ollama import ChatResponse
 
 
+def parse_guess(answer):
+    """Return the guess in an LLM answer, or None if it is not a number in 0-157."""
+    answer = answer.strip()
+    if answer.isdigit():
+        answer = int(answer)
+        if 0 <= answer <= 157:
+            return answer
+    return None
+
+
+def parse_card(answer, legal_cards):
+    """Return the legal card named in an LLM answer, or None."""
+    answer = answer.strip().upper()
+    for card in legal_cards:
+        if (
+            str(card).upper() == answer
+            or f"{card.rank.name}-{card.suit.name}".upper() == answer
+        ):
+            return card
+    return None
+
+
 class Player:
     def __init__(self, name):
         self.name = name
@@ -14,6 +42,7 @@ class Player:
         self.tricks_won = []
         self.points = 0
         self.guess = 0
+        self.rng = random.Random()
 
     def receive_hand(self, cards):
         self.hand = cards[:]
@@ -33,15 +62,18 @@ class Player:
 
 class RandomGuesser(Player):
     def make_guess(self, game_state):
-        self.guess = random.randint(0, 157)
+        self.guess = self.rng.randint(0, 157)
         print(f"{self} guesses {self.guess} points")
 
     def play_card(self, game_state):
         legal = game_state.get_legal_cards(self.hand, game_state.leading_suit)
-        card = random.choice(legal)
+        card = self.rng.choice(legal)
         self.hand.remove(card)
         return card
 
+    def __repr__(self):
+        return self.name
+
 
 class HumanPlayer(Player):
     def make_guess(self, game_state):
@@ -73,198 +105,186 @@ class HumanPlayer(Player):
 
 
 class LLMPlayer(Player):
+    provider = None
+    # the player's name is "<label> <model>"
+    label = "LLMPlayer"
+    # sampling params sent with every request, also part of the cache key
+    params = {}
+
     def __init__(self, name):
         super().__init__(name)
+        self.cache = get_default_cache()
+        self.limiter = get_limiter(self.provider)
+        self.prompt_tokens = {"static": 0, "dynamic": 0, "total": 0}
+        # requests that actually went to the provider (not answered by the cache)
+        self.usage = {"calls": 0, "tokens": 0}
+        self.telemetry = get_telemetry()
+
+    def _request(self, messages):
+        raise NotImplementedError
+
+    def _count_prompt(self, messages):
+        """Add the prompt tokens of ``messages`` up; returns their total and the
+        request's token budget for the limiter."""
+        report = token_report(messages)
+        for key, tokens in report.items():
+            self.prompt_tokens[key] += tokens
+        return report["total"], report["total"] + self.params.get("max_tokens", 0)
+
+    @contextmanager
+    def _provider_call(self, messages, kind, prompt_tokens, tokens):
+        """Usage and telemetry of one request that goes to the provider; yields
+        the attempt to hand to the limiter."""
+        self.usage["calls"] += 1
+        self.usage["tokens"] += tokens
+        with self.telemetry.call(self, kind, prompt_tokens) as trace:
+
+            def attempt():
+                trace["attempts"] += 1
+                return self._request(messages)
+
+            yield attempt
+
+    def _complete(self, messages, kind=None, accept=None):
+        """The provider's answer to ``messages``; ``accept(answer)`` decides whether it is cached."""
+        prompt_tokens, tokens = self._count_prompt(messages)
+
+        def call():
+            with self._provider_call(messages, kind, prompt_tokens, tokens) as attempt:
+                return self.limiter.call(attempt, tokens)
+
+        if self.cache is None:
+            return call()
+        return self.cache.complete(self.provider, self.model, messages, self.params, call, accept)
+
+    def _gave_up(self, exc):
+        """None once the provider keeps failing after all retries; other errors are raised."""
+        if not is_retryable(exc):
+            raise exc
+        print(f"{self} failed after retries: {exc!r}")
+        return None
+
+    def _try_complete(self, messages, kind=None, accept=None):
+        """Like ``_complete``, but None once the provider keeps failing after all retries."""
+        try:
+            return self._complete(messages, kind, accept)
+        except Exception as exc:
+            return self._gave_up(exc)
+
+    def _guess_from(self, answer):
+        """The guess in ``answer``, or a random one if there is no answer (the
+        provider failed, already logged) or it is not a legal guess."""
+        if answer is None:
+            self.telemetry.fallback(self, "guess", None)
+            return self.rng.randint(0, 157)
+        answer = answer.strip()
+        guess = parse_guess(answer)
+        if guess is not None:
+            return guess
+        print(f"{self} returned illegal guess: {answer}")
+        self.telemetry.fallback(self, "guess", answer)
+        return self.rng.randint(0, 157)
+
+    def _card_from(self, answer, legal_cards):
+        """The card named in ``answer``, or a random legal one, like ``_guess_from``."""
+        if answer is None:
+            self.telemetry.fallback(self, "card", None)
+            return self.rng.choice(legal_cards)
+        answer = answer.strip().upper()
+        card = parse_card(answer, legal_cards)
+        if card is not None:
+            return card
+        print(f"{self} returned illegal card: {answer}")
+        self.telemetry.fallback(self, "card", answer)
+        return self.rng.choice(legal_cards)
+
+    def _guess(self, messages):
+        answer = self._try_complete(
+            messages, "guess", lambda a: parse_guess(a) is not None
+        )
+        return self._guess_from(answer)
+
+    def _get_card(self, messages, legal_cards):
+        answer = self._try_complete(
+            messages, "card", lambda a: parse_card(a, legal_cards) is not None
+        )
+        return self._card_from(answer, legal_cards)
 
     def make_guess(self, game_state):
-        prompt = get_prompt_for_points_guess(game_state, self.hand)
-        self.guess = self.llm_func_point_guess(self.hand, prompt)
+        with game_state.phase("prompt"):
+            messages = get_messages_for_points_guess(game_state, self.hand)
+        self.guess = self._guess(messages)
         self.guess = int(self.guess)
         print(f"{self} guesses {self.guess} points")
 
     def play_card(self, game_state):
         legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
 
-        prompt = get_prompt_for_card_choice(game_state, legal_cards, self.hand)
-        card = self.llm_func_card_choice(legal_cards, prompt)
+        with game_state.phase("prompt"):
+            messages = get_messages_for_card_choice(game_state, legal_cards, self.hand)
+        card = self._get_card(messages, legal_cards)
         self.hand.remove(card)
         return card
 
     def __repr__(self):
-        return "LLMPlayer (llm_func={self.llm_func.__name__})"
+        return f"{self.label} {self.model}"
 
 
 class LLMPlayerChatGPT(LLMPlayer):
+    provider = "openai"
+    label = "ChatGPT"
+
     def __init__(self, name, openai_model="gpt-4o"):
         super().__init__(name)
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_client(self.provider)
         self.model = openai_model
 
-    def _guess(self, prompt):
+    def _request(self, messages):
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
-
-        answer = response.choices[0].message.content.strip()
-        if answer.isdigit():
-            answer = int(answer)
-            if 0 <= answer <= 157:
-                return answer
-        print(f"{self} returned illegal guess: {answer}")
-        return random.randint(0, 157)
-
-    def _get_card(self, prompt, legal_cards):
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        response = openai_client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
+            **self.params,
         )
-
-        answer = response.choices[0].message.content.strip().upper()
-        for card in legal_cards:
-            if (
-                str(card).upper() == answer
-                or f"{card.rank.name}-{card.suit.name}".upper() == answer
-            ):
-                return card
-
-        print(f"ChatGPT returned illegal card: {answer}")
-        return random.choice(legal_cards)
-
-    def make_guess(self, game_state):
-        prompt = get_prompt_for_points_guess(game_state, self.hand)
-        self.guess = self._guess(prompt)
-        self.guess = int(self.guess)
-        print(f"{self} guesses {self.guess} points")
-
-    def play_card(self, game_state):
-        legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
-
-        prompt = get_prompt_for_card_choice(game_state, legal_cards, self.hand)
-        card = self._get_card(prompt, legal_cards)
-        self.hand.remove(card)
-        return card
-
-    def __repr__(self):
-        return f"ChatGPT {self.model}"
+        note_response(response)
+        return response.choices[0].message.content
 
 
 class LLMPlayerAnthropic(LLMPlayer):
+    provider = "anthropic"
+    label = "Anthropic"
+    params = {"max_tokens": 10}
+
     def __init__(self, name, anthropic_model="claude-3-5-sonnet-latest"):
         super().__init__(name)
-        self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.client = get_client(self.provider)
         self.model = anthropic_model
 
-    def _guess(self, prompt):
+    def _request(self, messages):
+        system, messages = to_anthropic(messages)
         response = self.client.messages.create(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=10,
+            system=system,
+            messages=messages,
+            **self.params,
         )
-
-        answer = response.content[0].text.strip()
-        if answer.isdigit():
-            answer = int(answer)
-            if 0 <= answer <= 157:
-                return answer
-        print(f"Claude returned illegal guess: {answer}")
-        return random.randint(0, 157)
-
-    def _get_card(self, prompt, legal_cards):
-        response = self.client.messages.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=10,
-        )
-
-        answer = response.content[0].text.strip().upper()
-        for card in legal_cards:
-            if (
-                str(card).upper() == answer
-                or f"{card.rank.name}-{card.suit.name}".upper() == answer
-            ):
-                return card
-        print(f"Claude returned illegal card: {answer}")
-        return random.choice(legal_cards)
-
-    def make_guess(self, game_state):
-        prompt = get_prompt_for_points_guess(game_state, self.hand)
-        self.guess = self._guess(prompt)
-        self.guess = int(self.guess)
-        print(f"{self} guesses {self.guess} points")
-
-    def play_card(self, game_state):
-        legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
-
-        prompt = get_prompt_for_card_choice(game_state, legal_cards, self.hand)
-        card = self._get_card(prompt, legal_cards)
-        self.hand.remove(card)
-        return card
-
-    def __repr__(self):
-        return f"Anthropic {self.model}"
+        note_response(response)
+        return response.content[0].text
 
 
 class LLMPlayerGemma(LLMPlayer):
+    provider = "ollama"
+    label = "Gemma"
+
     def __init__(self, name, gemma_model="gemma3:27b"):
         super().__init__(name)
+        self.client = get_client(self.provider)
         self.model = gemma_model
 
-    def _guess(self, prompt):
-        response: ChatResponse = chat(
+    def _request(self, messages):
+        response: ChatResponse = self.client.chat(
             model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
+            messages=messages,
+            **self.params,
         )
-        answer = response["message"]["content"].strip()
-
-        if answer.isdigit():
-            answer = int(answer)
-            if 0 <= answer <= 157:
-                return answer
-        print(f"Gemma returned illegal guess: {answer}")
-        return random.randint(0, 157)
-
-    def _get_card(self, prompt, legal_cards):
-        response: ChatResponse = chat(
-            model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-        )
-        answer = response["message"]["content"]
-
-        for card in legal_cards:
-            if (
-                str(card).upper() == answer
-                or f"{card.rank.name}-{card.suit.name}".upper() == answer
-            ):
-                return card
-        print(f"Gemma returned illegal card: {answer}")
-        return random.choice(legal_cards)
-
-    def make_guess(self, game_state):
-        prompt = get_prompt_for_points_guess(game_state, self.hand)
-        self.guess = self._guess(prompt)
-        self.guess = int(self.guess)
-        print(f"{self} guesses {self.guess} points")
-
-    def play_card(self, game_state):
-        legal_cards = game_state.get_legal_cards(self.hand, game_state.leading_suit)
-
-        prompt = get_prompt_for_card_choice(game_state, legal_cards, self.hand)
-        card = self._get_card(prompt, legal_cards)
-        self.hand.remove(card)
-        return card
-
-    def __repr__(self):
-        return f"Gemma {self.model}"
+        note_response(response)
+        return response["message"]["content"]
@@ -0,0 +1,183 @@
+"""Per-phase timers and per-round profiling for ``DifferenzlerGame``.
+
+A game given a ``GameProfiler`` adds the wall time of each phase of a round
+(setup, deal, guess, every trick, score, persist), of the whole round, of
+the players' decisions and of prompt building by the LLM players. Without a
+profiler each phase costs one shared ``nullcontext``.
+
+Optionally every round is also run under cProfile (one ``.prof`` file per
+round in ``cprofile_dir``, summed up by ``report``) and/or tracemalloc (peak
+memory and the top allocation sites per round). cProfile only sees the
+thread that drives the game; tracemalloc is process-wide, so with several
+games on threads the memory numbers of a round include the others.
+
+    profiler = GameProfiler()
+    run_tournament(specs, n_games, profiler=profiler)
+    print(profiler.report())
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+NO_PHASE = nullcontext()
+# rounds traced by tracemalloc right now, which is process-wide
+_traced_rounds = 0
+_traced_lock = threading.Lock()
+# derived from the phases, shown after them in the report
+DERIVED = ("decisions", "prompt")
+
+
+class GameProfiler:
+    def __init__(self, cprofile_dir=None, trace_memory=False, top=10):
+        self.cprofile_dir = cprofile_dir
+        self.trace_memory = trace_memory
+        self.top = top
+        # phase -> [seconds, count]
+        self.phases = {}
+        # per round: game_id, round, seconds, peak memory, top allocations
+        self.rounds = []
+        self.profile_files = []
+        self._lock = threading.Lock()
+
+    def options(self):
+        """Constructor arguments, for building a profiler per game in a worker process."""
+        return {"cprofile_dir": self.cprofile_dir, "trace_memory": self.trace_memory, "top": self.top}
+
+    def add(self, name, seconds, count=1):
+        with self._lock:
+            total = self.phases.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += count
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    @contextmanager
+    def round(self, game):
+        """Time one round of ``game`` and capture its cProfile/tracemalloc data."""
+        profile = None
+        if self.cprofile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        if self.trace_memory:
+            _start_tracing()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add("round", seconds)
+            self.add("decisions", sum(game.think_time))
+            record = {"game_id": game.game_id, "round": game.rounds_played, "seconds": seconds}
+            if profile is not None:
+                profile.disable()
+            if self.trace_memory:
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                stats = tracemalloc.take_snapshot().statistics("lineno")[: self.top]
+                record["top_allocations"] = [str(stat) for stat in stats]
+                _stop_tracing()
+            if profile is not None:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                path = os.path.join(self.cprofile_dir, f"{game.game_id}-{game.rounds_played}.prof")
+                profile.dump_stats(path)
+                record["profile"] = path
+            with self._lock:
+                self.rounds.append(record)
+                if "profile" in record:
+                    self.profile_files.append(record["profile"])
+
+    def merge(self, other):
+        """Add the data of ``other`` (e.g. from a worker process)."""
+        for name, (seconds, count) in other.phases.items():
+            self.add(name, seconds, count)
+        with self._lock:
+            self.rounds.extend(other.rounds)
+            self.profile_files.extend(other.profile_files)
+
+    def summary(self):
+        """(phase, total seconds, count) in round order, then the derived times."""
+        with self._lock:
+            phases = dict(self.phases)
+
+        def order(name):
+            if name.startswith("trick "):
+                return (3, int(name.split()[1]))
+            fixed = ["setup", "deal", "guess", "trick", "score", "persist", "round", *DERIVED]
+            return (fixed.index(name) if name in fixed else len(fixed), 0)
+
+        return [(name, *phases[name]) for name in sorted(phases, key=order)]
+
+    def report(self, top=None):
+        summary = self.summary()
+        totals = {name: (seconds, count) for name, seconds, count in summary}
+        rounds, n_rounds = totals.get("round", (0.0, 0))
+        if "decisions" in totals:
+            # everything in a round that is not a player deciding
+            summary.append(("engine", rounds - totals["decisions"][0], n_rounds))
+        lines = [f"{'Phase':<12} {'Total s':>9} {'Count':>7} {'Mean ms':>9} {'Share':>6}"]
+        for name, seconds, count in summary:
+            share = f"{100 * seconds / rounds:.1f}%" if rounds else "-"
+            lines.append(
+                f"{name:<12} {seconds:>9.3f} {count:>7} {1000 * seconds / count:>9.3f} {share:>6}"
+            )
+        peaks = [r["peak_bytes"] for r in self.rounds if "peak_bytes" in r]
+        if peaks:
+            lines.append(f"\nPeak traced memory per round: max {max(peaks) / 2**20:.1f} MiB")
+            worst = max(self.rounds, key=lambda r: r.get("peak_bytes", 0))
+            lines.extend(f"  {line}" for line in worst["top_allocations"])
+        if self.profile_files:
+            lines.append(f"\ncProfile of {len(self.profile_files)} rounds ({self.cprofile_dir}):")
+            out = io.StringIO()
+            stats = pstats.Stats(*self.profile_files, stream=out)
+            # skip the header line per profile file
+            stats.files = []
+            stats.sort_stats("cumulative").print_stats(top or self.top)
+            lines.append(out.getvalue().strip("\n"))
+        return "\n".join(lines)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _start_tracing():
+    global _traced_rounds
+    with _traced_lock:
+        if _traced_rounds == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _traced_rounds += 1
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing():
+    global _traced_rounds
+    with _traced_lock:
+        _traced_rounds -= 1
+        if _traced_rounds == 0:
+            tracemalloc.stop()
+
+
+class _Phase:
+    # a plain class rather than @contextmanager: a few times cheaper per phase
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
@@ -0,0 +1,230 @@
+"""Per-provider rate limiting, adaptive concurrency and retries.
+
+Every provider gets a ``ProviderLimiter`` with two token buckets (requests
+per minute and tokens per minute) and an AIMD concurrency limit: each
+successful call raises the limit by ``1/limit``, an overload response
+(429/529, ``overloaded_error``) halves it. Overloads of calls started before
+the last decrease do not halve it again, so a burst of them counts once.
+Failed calls that are worth retrying are retried with full-jitter
+exponential backoff, honouring ``Retry-After`` when the provider sends one.
+
+Limits default to the values in ``DEFAULT_LIMITS`` and can be overridden
+with ``JASS_LLM_<PROVIDER>_RPM``, ``_TPM`` and ``_CONCURRENCY`` or
+``configure()``.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+OVERLOAD_STATUS = {429, 529}
+RETRYABLE_ERRORS = (
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "TimeoutException",
+)
+
+DEFAULT_LIMITS = {
+    "openai": {"rpm": 500, "tpm": 200_000, "concurrency": 16},
+    "anthropic": {"rpm": 50, "tpm": 40_000, "concurrency": 4},
+    "ollama": {"rpm": None, "tpm": None, "concurrency": 1},
+}
+
+
+def status_of(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_overload(exc):
+    return status_of(exc) in OVERLOAD_STATUS or "overloaded" in str(exc).lower()
+
+
+def is_retryable(exc):
+    if status_of(exc) in RETRYABLE_STATUS or is_overload(exc):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take ``amount`` tokens and return 0, or return the seconds until they are available."""
+        amount = min(amount, self.capacity)
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        rpm=None,
+        tpm=None,
+        concurrency=4,
+        max_retries=6,
+        base_delay=1.0,
+        max_delay=60.0,
+    ):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = concurrency
+        self.limit = float(concurrency)
+        # when the limit was last halved
+        self.decreased = float("-inf")
+        self.in_flight = 0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"calls": 0, "retries": 0, "overloads": 0, "failures": 0}
+        self._cond = threading.Condition()
+
+    def _try_acquire(self, tokens):
+        """Acquire a slot and return 0, or return how long to wait before trying again."""
+        if self.in_flight >= max(1, int(self.limit)):
+            return None
+        now = time.monotonic()
+        wait = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                wait = max(wait, bucket.reserve(amount, now))
+        if wait:
+            return wait
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.take(amount)
+        self.in_flight += 1
+        self.stats["calls"] += 1
+        return 0.0
+
+    def acquire(self, tokens=0):
+        """Wait for a slot; returns when it was acquired, to pass to ``release``."""
+        with self._cond:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait == 0.0:
+                    return time.monotonic()
+                self._cond.wait(wait)
+
+    async def aacquire(self, tokens=0):
+        while True:
+            with self._cond:
+                wait = self._try_acquire(tokens)
+                if wait == 0.0:
+                    return time.monotonic()
+            await asyncio.sleep(wait if wait is not None else 0.05)
+
+    def release(self, started=None, overloaded=False):
+        """Free the slot of a call that began at ``started`` (from ``acquire``)."""
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.stats["overloads"] += 1
+                # the other calls in flight at a decrease already hit the old limit
+                if started is None or started >= self.decreased:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.decreased = time.monotonic()
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, exc):
+        delay = retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        return delay
+
+    def _failed(self, attempt, exc):
+        """Book a failed call and return the delay before the next attempt, or None to give up."""
+        with self._cond:
+            if attempt < self.max_retries and is_retryable(exc):
+                self.stats["retries"] += 1
+                return self._backoff(attempt, exc)
+            self.stats["failures"] += 1
+            return None
+
+    def call(self, fn, tokens=0):
+        """Call ``fn()`` within the limits, retrying transient provider errors."""
+        for attempt in range(self.max_retries + 1):
+            started = self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as exc:
+                self.release(started, overloaded=is_overload(exc))
+                delay = self._failed(attempt, exc)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.release(started)
+            return result
+
+    async def acall(self, fn, tokens=0):
+        """Async version of ``call``; ``fn()`` returns an awaitable."""
+        for attempt in range(self.max_retries + 1):
+            started = await self.aacquire(tokens)
+            try:
+                result = await fn()
+            except Exception as exc:
+                self.release(started, overloaded=is_overload(exc))
+                delay = self._failed(attempt, exc)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.release(started)
+            return result
+
+
+_limiters = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def _env_limit(provider, name, default):
+    value = os.getenv(f"JASS_LLM_{provider.upper()}_{name.upper()}")
+    return int(value) if value else default
+
+
+def configure(provider, **limits):
+    """Override the limits of ``provider``; applies to limiters created afterwards."""
+    with _lock:
+        _overrides.setdefault(provider, {}).update(limits)
+        _limiters.pop(provider, None)
+
+
+def get_limiter(provider):
+    with _lock:
+        if provider not in _limiters:
+            limits = dict(DEFAULT_LIMITS.get(provider, {"concurrency": 4}))
+            for name in ("rpm", "tpm", "concurrency"):
+                limits[name] = _env_limit(provider, name, limits.get(name))
+            limits.update(_overrides.get(provider, {}))
+            _limiters[provider] = ProviderLimiter(**limits)
+        return _limiters[provider]
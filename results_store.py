@@ -0,0 +1,221 @@
+"""Long-format results store.
+
+One row per (game, round, seat) with the guess, the points actually made,
+the penalty, the running total, the model, the time the seat spent deciding,
+the game seed and, for duplicate play, the deal, in a SQLite file indexed by
+game, by player and by deal.
+
+Rows are queued by ``add`` and written by a background thread in batches of
+up to ``batch_size`` rows, one transaction per batch, so games on any number
+of threads can report without waiting on the disk. The file is in WAL mode,
+so several processes can write to it as well and readers never block
+writers. ``flush`` waits until everything queued is on disk.
+"""
+
+import atexit
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = "results.sqlite"
+
+COLUMNS = (
+    "game_id",
+    "round",
+    "seat",
+    "player",
+    "model",
+    "guess",
+    "points",
+    "penalty",
+    "total",
+    "latency",
+    "seed",
+    "trump",
+    "created",
+    "deal_id",
+)
+
+
+def round_rows(game):
+    """Rows of the round ``game`` just scored, in seat order."""
+    log = game.log
+    guesses = log.guesses()
+    now = time.time()
+    rows = []
+    for seat, points in sorted(log.scores().items()):
+        player = game.players[seat]
+        rows.append(
+            (
+                game.game_id,
+                game.rounds_played,
+                seat,
+                str(player),
+                getattr(player, "model", None) or type(player).__name__,
+                guesses[seat],
+                points,
+                abs(guesses[seat] - points),
+                player.points,
+                game.think_time[seat],
+                None if game.seed is None else str(game.seed),
+                game.trump_suit.name,
+                now,
+                game.deal_id,
+            )
+        )
+    return rows
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_PATH, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._queue = queue.Queue()
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                game_id TEXT,
+                round INTEGER,
+                seat INTEGER,
+                player TEXT,
+                model TEXT,
+                guess INTEGER,
+                points INTEGER,
+                penalty INTEGER,
+                total INTEGER,
+                latency REAL,
+                seed TEXT,
+                trump TEXT,
+                created REAL,
+                deal_id TEXT
+            )"""
+        )
+        # files written before duplicate play existed
+        if "deal_id" not in [row[1] for row in conn.execute("PRAGMA table_info(results)")]:
+            conn.execute("ALTER TABLE results ADD COLUMN deal_id TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS results_game ON results (game_id, round)")
+        conn.execute("CREATE INDEX IF NOT EXISTS results_player ON results (player)")
+        conn.execute("CREATE INDEX IF NOT EXISTS results_deal ON results (deal_id)")
+        conn.commit()
+        conn.close()
+        self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, rows):
+        """Queue rows (tuples in ``COLUMNS`` order) for writing."""
+        rows = list(rows)
+        if rows:
+            self._queue.put(rows)
+
+    def _write_loop(self):
+        conn = self._connect()
+        insert = f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while True:
+            batch = [self._queue.get()]
+            size = 0 if batch[0] is None else len(batch[0])
+            # collect what else arrives within flush_interval, up to a batch
+            deadline = time.monotonic() + self.flush_interval
+            while size < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+                size += 0 if batch[-1] is None else len(batch[-1])
+            rows = [row for rows in batch if rows is not None for row in rows]
+            if rows:
+                with conn:
+                    conn.executemany(insert, rows)
+                self.rows_written += len(rows)
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is None:
+                conn.close()
+                return
+
+    def flush(self):
+        """Block until every queued row is written."""
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def read(self, after_id=0, columns=COLUMNS):
+        return read_results(self.path, after_id, columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path=DEFAULT_PATH, after_id=0, columns=COLUMNS):
+    """Return (id, *columns) of the rows with an id above ``after_id``, in order."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM results WHERE id > ? ORDER BY id",
+            (after_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def import_csv(csv_path, path=DEFAULT_PATH):
+    """Copy the rounds of a ``game_stats.csv`` from before the store into it, once.
+
+    The CSV has one row per round with every player's running total, so the
+    imported rows only carry the player and that ``total``. The round penalty
+    cannot be told from it: games that reused player objects carry totals
+    over from the previous game, and the old scoring is baked in. So
+    ``penalty``, like the guesses, points, models, timings, seeds and trumps,
+    is NULL, and statistics and ratings skip these rows. Games already in the
+    store are skipped, so importing twice adds nothing. Returns the number of
+    rows added.
+    """
+    known = {row[1] for row in read_results(path, 0, ("game_id",))}
+    rows = []
+    with open(csv_path, newline="") as f:
+        for line in csv.reader(f):
+            # skip the header of files that have one
+            if len(line) < 4 or not line[1].isdigit() or line[0] in known:
+                continue
+            for seat in range((len(line) - 2) // 2):
+                rows.append(
+                    (line[0], int(line[1]), seat, line[2 + 2 * seat], None, None, None,
+                     None, int(line[3 + 2 * seat]), None, None, None, None, None)
+                )
+    if rows:
+        with ResultsStore(path) as store:
+            store.add(rows)
+    return len(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_results_store(path=DEFAULT_PATH):
+    """Process-wide ``ResultsStore`` for ``path``."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ResultsStore(path)
+            atexit.register(_stores[path].close)
+        return _stores[path]
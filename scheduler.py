@@ -0,0 +1,222 @@
+"""Adaptive tournament that stops as soon as the results are clear.
+
+``AdaptiveTournament`` plays duplicate games (``run_tournament(...,
+duplicate=True)``) one lineup of four players at a time. After every game it
+updates per player the mean penalty per deal and per pair of players the
+paired difference of their penalties on the deals both played. Every
+estimate has an anytime-valid confidence bound (a normal-mixture confidence
+sequence), so the results can be checked after each game without inflating
+the error rate the way repeated t-tests would.
+
+The next game goes to the lineup whose pairs are furthest from a conclusion,
+and the tournament stops once every pair is ordered at level ``alpha``
+(Bonferroni over the pairs), or shown equivalent within ``tolerance``, or
+when a budget of games, API calls, tokens or money is spent. Budgets are
+checked between games, so the last game may overshoot them.
+"""
+
+import itertools
+import math
+import random
+
+from results_store import COLUMNS
+from stats import mean_se
+from tournament import run_tournament
+
+N_SEATS = 4
+PLAYER = COLUMNS.index("player")
+PENALTY = COLUMNS.index("penalty")
+DEAL = COLUMNS.index("deal_id")
+
+
+def confidence_radius(values, alpha, horizon=20):
+    """Half-width of a confidence sequence for the mean of ``values``.
+
+    Normal-mixture boundary (Robbins; Howard et al. 2021) with the sample
+    standard deviation plugged in. It holds for every n at once, so it may be
+    checked after each new value; ``horizon`` is the n where it is tightest.
+    """
+    n = len(values)
+    if n < 2:
+        return math.inf
+    sd = mean_se(values)[1] * math.sqrt(n)
+    rho2 = (-2 * math.log(alpha) + math.log(1 - 2 * math.log(alpha))) / horizon
+    return sd * math.sqrt(
+        2 * (n * rho2 + 1) / (n**2 * rho2) * math.log(math.sqrt(n * rho2 + 1) / alpha)
+    )
+
+
+class AdaptiveTournament:
+    def __init__(
+        self,
+        specs,
+        n_rounds=1,
+        alpha=0.05,
+        tolerance=None,
+        min_deals=10,
+        max_games=None,
+        max_calls=None,
+        max_tokens=None,
+        max_cost=None,
+        prices=None,
+        parallel=1,
+        seed=None,
+        horizon=20,
+        **tournament_kwargs,
+    ):
+        """``specs`` are ``PlayerSpec``s, at least four. ``prices`` maps a
+        player (its ``__repr__``) to USD per million tokens for ``max_cost``;
+        ``max_games`` counts tables. ``parallel`` duplicate games are played
+        per step; other arguments go to ``run_tournament``."""
+        if len(specs) < N_SEATS:
+            raise ValueError(f"Need at least {N_SEATS} players, got {len(specs)}")
+        self.specs = list(specs)
+        self.names = [spec.name() for spec in self.specs]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Players need distinct names: {self.names}")
+        self.n_rounds = n_rounds
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.min_deals = min_deals
+        self.max_games = max_games
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.prices = prices or {}
+        self.parallel = parallel
+        self.horizon = horizon
+        self.tournament_kwargs = tournament_kwargs
+        self.rng = random.Random(seed)
+
+        self.games = 0
+        self.calls = 0
+        self.tokens = 0
+        self.cost = 0.0
+        # player -> mean penalty per deal
+        self.penalties = {name: [] for name in self.names}
+        # (player, player) -> difference of their mean penalties per deal
+        self.diffs = {pair: [] for pair in itertools.combinations(self.names, 2)}
+        # deal -> player -> penalties, until every table of the deal is in
+        self._deals = {}
+
+    def _on_game(self, result_rows, usage):
+        self.games += 1
+        for player, used in usage.items():
+            self.calls += used["calls"]
+            self.tokens += used["tokens"]
+            self.cost += used["tokens"] * self.prices.get(player, 0.0) / 1e6
+        for row in result_rows:
+            self._deals.setdefault(row[DEAL], {}).setdefault(row[PLAYER], []).append(row[PENALTY])
+
+    def _fold_deals(self):
+        """Move deals that were played at every table into the estimates."""
+        for deal, by_player in list(self._deals.items()):
+            if any(len(penalties) < N_SEATS for penalties in by_player.values()):
+                continue
+            del self._deals[deal]
+            means = {p: sum(penalties) / len(penalties) for p, penalties in by_player.items()}
+            for player, mean in means.items():
+                self.penalties[player].append(mean)
+            for a, b in itertools.combinations(self.names, 2):
+                if a in means and b in means:
+                    self.diffs[(a, b)].append(means[a] - means[b])
+
+    def pair(self, a, b):
+        """Estimate of penalty(a) - penalty(b) and whether it is decided."""
+        diffs = self.diffs[(a, b)]
+        alpha = self.alpha / len(self.diffs)
+        radius = confidence_radius(diffs, alpha, self.horizon)
+        mean = sum(diffs) / len(diffs) if diffs else 0.0
+        if len(diffs) < self.min_deals:
+            result = "open"
+        elif abs(mean) > radius:
+            result = "better" if mean < 0 else "worse"
+        elif self.tolerance is not None and abs(mean) + radius < self.tolerance:
+            result = "equivalent"
+        else:
+            result = "open"
+        return {"a": a, "b": b, "deals": len(diffs), "diff": mean, "radius": radius, "result": result}
+
+    def pairs(self):
+        return [self.pair(a, b) for a, b in self.diffs]
+
+    def next_lineup(self):
+        """Indices of the specs of the next game: most untested pairs first,
+        then the most total distance from a decision over the open pairs."""
+        pairs = {(row["a"], row["b"]): row for row in self.pairs()}
+        scored = []
+        for lineup in itertools.combinations(range(len(self.specs)), N_SEATS):
+            untested = gap = 0
+            for i, j in itertools.combinations(lineup, 2):
+                row = pairs[(self.names[i], self.names[j])]
+                if row["result"] != "open":
+                    continue
+                if row["deals"] < self.min_deals:
+                    untested += 1
+                else:
+                    gap += row["radius"] - abs(row["diff"])
+            scored.append(((untested, gap), lineup))
+        best = max(score for score, _ in scored)
+        return self.rng.choice([lineup for score, lineup in scored if score == best])
+
+    def stop_reason(self):
+        if all(row["result"] != "open" for row in self.pairs()):
+            return "all pairs decided"
+        if self.max_games is not None and self.games >= self.max_games:
+            return "game budget spent"
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return "call budget spent"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "token budget spent"
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            return "cost budget spent"
+        return None
+
+    def run(self):
+        """Play until ``stop_reason`` says so and return the reason."""
+        while True:
+            reason = self.stop_reason()
+            if reason is not None:
+                break
+            lineup = self.next_lineup()
+            run_tournament(
+                [self.specs[i] for i in lineup],
+                self.parallel,
+                n_rounds=self.n_rounds,
+                seed=self.rng.getrandbits(64),
+                duplicate=True,
+                on_game=self._on_game,
+                **self.tournament_kwargs,
+            )
+            self._fold_deals()
+            decided = sum(row["result"] != "open" for row in self.pairs())
+            print(
+                f"{self.games} games, {self.calls} calls, {self.tokens} tokens, "
+                f"${self.cost:.2f}: {decided}/{len(self.diffs)} pairs decided"
+            )
+        print(f"Stopped: {reason}")
+        return reason
+
+    def report(self):
+        lines = [f"{'Player':<40} {'Deals':>6} {'Penalty':>18}"]
+        players = sorted(self.penalties.items(), key=lambda item: mean_or_nan(item[1]))
+        for player, penalties in players:
+            radius = confidence_radius(penalties, self.alpha, self.horizon)
+            lines.append(
+                f"{player:<40} {len(penalties):>6} {mean_or_nan(penalties):>8.2f} ± {radius:>7.2f}"
+            )
+        lines.append("")
+        lines.append(
+            f"{'Pair (penalty of first minus second)':<60} {'Deals':>6} {'Difference':>18} {'Result':>11}"
+        )
+        for row in self.pairs():
+            pair = f"{row['a']} vs {row['b']}"
+            lines.append(
+                f"{pair:<60} {row['deals']:>6} {row['diff']:>8.2f} ± {row['radius']:>7.2f} "
+                f"{row['result']:>11}"
+            )
+        return "\n".join(lines)
+
+
+def mean_or_nan(values):
+    return sum(values) / len(values) if values else float("nan")
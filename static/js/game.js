@@ -12,6 +12,8 @@ class JassGame {
         this.currentPlayerOrder = []; // Track player order for current trick
         this.currentPlayerIndex = 0; // Index of currently active player
         this.lastRoundData = null; // Store round data for scoreboard
+        this.eventQueue = []; // Game events waiting to be shown
+        this.showingEvent = false;
         
         this.initializeEventListeners();
         this.setupSocketListeners();
@@ -86,6 +88,34 @@ class JassGame {
         });
     }
 
+    // The server sends game events as fast as they happen and suggests a
+    // pause after each one (pause_ms); show them one by one at that pace.
+    onGameEvent(name, handler) {
+        this.socket.on(name, (data) => {
+            this.eventQueue.push({ handler, data });
+            this.showNextEvent();
+        });
+    }
+
+    showNextEvent() {
+        if (this.showingEvent || this.eventQueue.length === 0) {
+            return;
+        }
+        const { handler, data } = this.eventQueue.shift();
+        this.showingEvent = true;
+        try {
+            handler(data);
+        } catch (error) {
+            console.error('Error showing game event:', error);
+        } finally {
+            // a failing handler must not stall the events after it
+            setTimeout(() => {
+                this.showingEvent = false;
+                this.showNextEvent();
+            }, data.pause_ms || 0);
+        }
+    }
+
     setupSocketListeners() {
         this.socket.on('connected', (data) => {
             console.log('Connected to server:', data.message);
@@ -113,7 +143,7 @@ class JassGame {
             this.updateGameControls();
         });
 
-        this.socket.on('round_start', (data) => {
+        this.onGameEvent('round_start', (data) => {
             console.log('Round started:', data);
             this.updateRoundInfo(data.round, data.trump_suit);
             this.updatePlayerHand(data.hand);
@@ -122,13 +152,13 @@ class JassGame {
             this.addMessage(`Round ${data.round} started! Trump suit: ${data.trump_suit}`);
         });
 
-        this.socket.on('request_guess', (data) => {
+        this.onGameEvent('request_guess', (data) => {
             console.log('Guess requested:', data);
             this.gameState = 'guessing';
             this.showGuessModal(data.trump_suit, data.hand);
         });
 
-        this.socket.on('round_guess_results', (data) => {
+        this.onGameEvent('round_guess_results', (data) => {
             console.log('🎯 Round guess results received:', data);
             this.addMessage('--- Round Results ---');
             data.results.forEach(result => {
@@ -139,7 +169,7 @@ class JassGame {
             this.showRoundScoreboard(data.results, data.round_data);
         });
 
-        this.socket.on('trick_start', (data) => {
+        this.onGameEvent('trick_start', (data) => {
             console.log('Trick started:', data);
             this.updateTrickInfo(data.trick_number);
             this.currentTrick = [];
@@ -150,7 +180,7 @@ class JassGame {
             this.addMessage(`Trick ${data.trick_number} started`);
         });
 
-        this.socket.on('request_card', (data) => {
+        this.onGameEvent('request_card', (data) => {
             console.log('Card requested:', data);
             this.gameState = 'card_selection';
             this.legalCards = data.legal_cards;
@@ -161,7 +191,7 @@ class JassGame {
             this.addMessage('Your turn! Select a card to play.');
         });
 
-        this.socket.on('card_played', (data) => {
+        this.onGameEvent('card_played', (data) => {
             console.log('Card played:', data);
             this.addMessage(`${data.player} played ${data.card.rank}-${data.card.suit}`);
             this.currentTrick = data.trick;
@@ -185,7 +215,11 @@ class JassGame {
             }
         });
 
-        this.socket.on('trick_complete', (data) => {
+        this.onGameEvent('last_trick_bonus', (data) => {
+            this.addMessage(data.message);
+        });
+
+        this.onGameEvent('trick_complete', (data) => {
             console.log('Trick complete:', data);
             this.addMessage(`${data.winner} won the trick!`);
             this.showTrickWinner(data.winner);
@@ -199,7 +233,7 @@ class JassGame {
             }, 3000);
         });
 
-        this.socket.on('round_complete', (data) => {
+        this.onGameEvent('round_complete', (data) => {
             console.log('Round complete:', data);
             this.addMessage(`Round ${data.round} complete!`);
             this.updateAllScores(data.scores);
@@ -207,7 +241,7 @@ class JassGame {
             this.lastRoundData = data;
         });
 
-        this.socket.on('game_complete', (data) => {
+        this.onGameEvent('game_complete', (data) => {
             console.log('Game complete:', data);
             this.addMessage(`Game complete! Winner: ${data.winner}`);
             this.showGameOverModal(data.final_scores, data.winner);
@@ -1,112 +1,402 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+"""Player statistics from the results store.
+
+``Stats`` keeps running aggregates per player (the ``__repr__`` of the
+player): rounds, mean and variance of the penalty (Welford), a histogram of
+the penalty for exact quantiles (penalties are 0-157), min/max, mean
+decision time and round wins (lowest penalty of the round; ties count for
+every tied seat). ``update`` only reads rows added since the last call and
+the whole state is saved to a small JSON checkpoint, so
+
+    python stats.py            # print the summary
+    python stats.py --plots    # and draw the plots into plots/
+
+only scans the results added since the previous run. Plots are drawn from
+the aggregates and matplotlib is only imported when they are asked for.
+
+``duplicate_summary`` compares players on the rounds of duplicate play
+(``run_tournament(..., duplicate=True)``), where every deal was played at
+several tables: a penalty is scored against the other tables that held the
+same hand, which removes most of the card luck from the comparison.
+
+    python stats.py --duplicate
+
+Rounds recorded in ``game_stats.csv`` before the results store existed are
+copied into it once with
+
+    python stats.py --import-csv game_stats.csv
+
+They keep only the running totals (see ``results_store.import_csv``), so
+the statistics above skip them.
+"""
+
+import argparse
+import json
+import math
 import os
 
-# Ensure plots directory exists
-os.makedirs("plots", exist_ok=True)
-
-
-df = pd.read_csv("game_stats.csv", header=None, names=[
-    "game_id", "round", "name_player1", "points_player1", 
-    "name_player2", "points_player2", "name_player3", "points_player3", 
-    "name_player4", "points_player4"
-])
-
-melted = pd.concat(
-    [
-        df[["game_id", "round", "name_player1", "points_player1"]].rename(
-            columns={"name_player1": "player", "points_player1": "points"}
-        ),
-        df[["game_id", "round", "name_player2", "points_player2"]].rename(
-            columns={"name_player2": "player", "points_player2": "points"}
-        ),
-        df[["game_id", "round", "name_player3", "points_player3"]].rename(
-            columns={"name_player3": "player", "points_player3": "points"}
-        ),
-        df[["game_id", "round", "name_player4", "points_player4"]].rename(
-            columns={"name_player4": "player", "points_player4": "points"}
-        ),
-    ],
-    ignore_index=True,
-)
-
-wins = melted.loc[melted.groupby("game_id")["points"].idxmin(), "player"].value_counts()
-max_points = melted.groupby("player")["points"].max()
-min_points = melted.groupby("player")["points"].min()
-average_points = melted.groupby("player")["points"].mean()
-median_points = melted.groupby("player")["points"].median()
-
-# Display some stats (wins, max, min, ...)
-print("Number of Wins (Lowest Score per Round):")
-print(wins)
-print("\nMax Points per Player:")
-print(max_points)
-print("\nMin Points per Player:")
-print(min_points)
-print("\nAverage Points per Player:")
-print(average_points)
-print("\nMedian Points per Player:")
-print(median_points)
-
-# --- 1. Bar plot with mean & std ---
-stats = melted.groupby("player")["points"].agg(["mean", "std"])
-
-plt.figure()
-stats["mean"].plot(kind="bar", yerr=stats["std"], capsize=4, rot=0)
-plt.title("Average Scores with Standard Deviation")
-plt.xlabel("Player")
-plt.ylabel("Points")
-plt.tight_layout()
-plt.savefig("plots/average_scores.png")
-
-# --- 2. Box plot of score distributions ---
-plt.figure(figsize=(8, 6))
-ax = sns.boxplot(data=melted, x="player", y="points", hue="player", palette="Set2", legend=False)
-plt.title("Score Distribution per Player", fontsize=14, fontweight="bold")
-plt.xlabel("Player", fontsize=12)
-plt.ylabel("Points", fontsize=12)
-plt.tight_layout()
-plt.savefig("plots/score_distribution.png")
-
-# --- 3. Violin plot
-plt.figure(figsize=(8, 5))
-sns.violinplot(x="player", y="points", data=melted, inner="quartile")
-plt.title("Score Distributions per Player (Violin Plot)")
-plt.ylabel("Points")
-plt.xlabel("Player")
-plt.tight_layout()
-plt.savefig("plots/score_distribution_violin.png")
-
-# --- 4. Heatmap of scores by game and player ---
-# Aggregate by mean in case there are duplicate game_id/player combinations
-heatmap_data = melted.groupby(["game_id", "player"])["points"].mean().unstack()
-
-plt.figure(figsize=(8, 6))
-sns.heatmap(heatmap_data, annot=True, cmap="YlGnBu")
-plt.title("Heatmap of Scores by Game and Player")
-plt.xlabel("Player")
-plt.ylabel("Game ID")
-plt.tight_layout()
-plt.savefig("plots/heatmap_scores.png")
-
-# --- 5. Scatter plot of mean vs std ---
-plt.figure(figsize=(8, 6))
-sns.scatterplot(x="mean", y="std", data=stats, s=100)
-
-for player in stats.index:
-    plt.text(
-        stats.loc[player, "mean"],
-        stats.loc[player, "std"],
-        player,
-        horizontalalignment="left",
-        size="medium",
-        color="black",
-        weight="semibold",
+from results_store import DEFAULT_PATH, import_csv, read_results
+
+DEFAULT_CHECKPOINT = "stats_checkpoint.json"
+MAX_POINTS = 157
+N_SEATS = 4
+ROW_COLUMNS = ("game_id", "round", "player", "penalty", "latency")
+Z_95 = 1.96
+
+
+class PlayerStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.wins = 0
+        self.latency = 0.0
+        self.hist = [0] * (MAX_POINTS + 1)
+
+    def add(self, penalty, latency=0.0, won=False):
+        self.count += 1
+        delta = penalty - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (penalty - self.mean)
+        self.min = penalty if self.min is None else min(self.min, penalty)
+        self.max = penalty if self.max is None else max(self.max, penalty)
+        self.wins += won
+        self.latency += ((latency or 0.0) - self.latency) / self.count
+        self.hist[min(penalty, MAX_POINTS)] += 1
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        """Smallest penalty with at least a fraction ``q`` of the rounds at or below it."""
+        target = q * self.count
+        seen = 0
+        for penalty, n in enumerate(self.hist):
+            seen += n
+            if n and seen >= target:
+                return penalty
+        return None
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.__dict__.update(data)
+        return stats
+
+
+class Stats:
+    def __init__(self, results_path=DEFAULT_PATH):
+        self.results_path = results_path
+        self.last_id = 0
+        self.players = {}
+        # rows of rounds that are not complete yet
+        self.pending = []
+
+    def update(self):
+        """Read the rows added since the last update; return how many there were."""
+        rows = read_results(self.results_path, self.last_id, ROW_COLUMNS)
+        if rows:
+            self.add_rows(rows)
+            self.last_id = rows[-1][0]
+        return len(rows)
+
+    def add_rows(self, rows):
+        """Add (id, game_id, round, player, penalty, latency) rows."""
+        rounds = {}
+        for row in self.pending + [list(row) for row in rows]:
+            rounds.setdefault((row[1], row[2]), []).append(row)
+        self.pending = []
+        for seats in rounds.values():
+            if len(seats) < N_SEATS:
+                self.pending.extend(seats)
+                continue
+            if any(row[4] is None for row in seats):
+                # imported from game_stats.csv, without penalties
+                continue
+            best = min(row[4] for row in seats)
+            for _, _, _, player, penalty, latency in seats:
+                if player not in self.players:
+                    self.players[player] = PlayerStats()
+                self.players[player].add(penalty, latency, penalty == best)
+
+    def summary(self):
+        """One dict per player, best mean penalty first."""
+        rows = [
+            {
+                "player": player,
+                "rounds": s.count,
+                "wins": s.wins,
+                "mean": s.mean,
+                "std": s.std,
+                "median": s.quantile(0.5),
+                "p90": s.quantile(0.9),
+                "min": s.min,
+                "max": s.max,
+                "latency": s.latency,
+            }
+            for player, s in self.players.items()
+        ]
+        return sorted(rows, key=lambda row: row["mean"])
+
+    def report(self):
+        lines = [
+            f"{'Player':<40} {'Rounds':>7} {'Wins':>6} {'Mean':>7} {'Std':>7} "
+            f"{'Median':>7} {'P90':>5} {'Min':>5} {'Max':>5} {'Time':>7}"
+        ]
+        for row in self.summary():
+            lines.append(
+                f"{row['player']:<40} {row['rounds']:>7} {row['wins']:>6} "
+                f"{row['mean']:>7.2f} {row['std']:>7.2f} {row['median']:>7} "
+                f"{row['p90']:>5} {row['min']:>5} {row['max']:>5} {row['latency']:>6.2f}s"
+            )
+        return "\n".join(lines)
+
+    def save(self, path=DEFAULT_CHECKPOINT):
+        data = {
+            "results_path": self.results_path,
+            "last_id": self.last_id,
+            "pending": self.pending,
+            "players": {p: s.to_dict() for p, s in self.players.items()},
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CHECKPOINT, results_path=DEFAULT_PATH):
+        """Stats from a checkpoint, or empty ones if there is none for ``results_path``."""
+        stats = cls(results_path)
+        if path is None or not os.path.exists(path):
+            return stats
+        with open(path) as f:
+            data = json.load(f)
+        if data["results_path"] != results_path:
+            return stats
+        stats.last_id = data["last_id"]
+        stats.pending = data["pending"]
+        stats.players = {p: PlayerStats.from_dict(s) for p, s in data["players"].items()}
+        return stats
+
+
+def update_stats(results_path=DEFAULT_PATH, checkpoint=DEFAULT_CHECKPOINT):
+    """Load the checkpoint, add the new results and save it again."""
+    stats = Stats.load(checkpoint, results_path)
+    if stats.update() and checkpoint is not None:
+        stats.save(checkpoint)
+    return stats
+
+
+def mean_se(values):
+    """Mean and standard error of ``values``."""
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, float("nan")
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    return mean, math.sqrt(var / n)
+
+
+def duplicate_summary(results_path=DEFAULT_PATH):
+    """Compare players on the same cards.
+
+    Returns (players, pairs). ``players`` has per player the mean penalty
+    and the mean penalty relative to the other tables with the same hand
+    (same deal and seat), each with its standard error over deals.
+    ``pairs`` has per pair of players the mean difference of their penalties
+    on the deals both played, with its standard error, and ``gain``: how many
+    times more deals the same comparison would need on independent deals.
+    """
+    rows = read_results(results_path, 0, ("deal_id", "seat", "player", "penalty"))
+    hands = {}
+    for _, deal, seat, player, penalty in rows:
+        if deal is not None:
+            hands.setdefault((deal, seat), []).append((player, penalty))
+
+    raw, relative = {}, {}
+    for (deal, _), tables in hands.items():
+        if len(tables) < 2:
+            continue
+        total = sum(penalty for _, penalty in tables)
+        for player, penalty in tables:
+            others = (total - penalty) / (len(tables) - 1)
+            raw.setdefault(player, {}).setdefault(deal, []).append(penalty)
+            relative.setdefault(player, {}).setdefault(deal, []).append(penalty - others)
+
+    def deal_means(by_deal):
+        return {deal: sum(v) / len(v) for deal, v in by_deal.items()}
+
+    players = []
+    for player in raw:
+        mean, se = mean_se(list(deal_means(raw[player]).values()))
+        rel, rel_se = mean_se(list(deal_means(relative[player]).values()))
+        players.append(
+            {
+                "player": player,
+                "deals": len(raw[player]),
+                "mean": mean,
+                "se": se,
+                "relative": rel,
+                "relative_se": rel_se,
+            }
+        )
+    players.sort(key=lambda row: row["relative"])
+
+    pairs = []
+    for i, row_a in enumerate(players):
+        means_a = deal_means(raw[row_a["player"]])
+        for row_b in players[i + 1 :]:
+            means_b = deal_means(raw[row_b["player"]])
+            diffs = [means_a[deal] - means_b[deal] for deal in means_a if deal in means_b]
+            if not diffs:
+                continue
+            diff, se = mean_se(diffs)
+            # variance of the same difference between independent samples
+            unpaired = row_a["se"] ** 2 + row_b["se"] ** 2
+            pairs.append(
+                {
+                    "a": row_a["player"],
+                    "b": row_b["player"],
+                    "deals": len(diffs),
+                    "diff": diff,
+                    "se": se,
+                    "gain": unpaired / se**2 if se > 0 else float("nan"),
+                }
+            )
+    return players, pairs
+
+
+def duplicate_report(results_path=DEFAULT_PATH):
+    players, pairs = duplicate_summary(results_path)
+    if not players:
+        return "No duplicate deals in the results"
+    lines = [
+        f"{'Player':<40} {'Deals':>6} {'Penalty':>16} {'Relative':>16}"
+    ]
+    for row in players:
+        lines.append(
+            f"{row['player']:<40} {row['deals']:>6} "
+            f"{row['mean']:>8.2f} ± {Z_95 * row['se']:>5.2f} "
+            f"{row['relative']:>8.2f} ± {Z_95 * row['relative_se']:>5.2f}"
+        )
+    lines.append("")
+    lines.append(
+        f"{'Pair (penalty of first minus second)':<60} {'Deals':>6} {'Difference':>16} {'Gain':>6}"
     )
+    for row in pairs:
+        pair = f"{row['a']} vs {row['b']}"
+        lines.append(
+            f"{pair:<60} {row['deals']:>6} {row['diff']:>8.2f} ± {Z_95 * row['se']:>5.2f} "
+            f"{row['gain']:>5.1f}x"
+        )
+    return "\n".join(lines)
+
+
+def plot(stats, out_dir="plots"):
+    """Draw the plots of ``stats`` into ``out_dir``."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    os.makedirs(out_dir, exist_ok=True)
+    summary = stats.summary()
+    players = [row["player"] for row in summary]
+    means = [row["mean"] for row in summary]
+    stds = [row["std"] for row in summary]
+
+    # --- 1. Bar plot with mean & std ---
+    plt.figure()
+    plt.bar(players, means, yerr=stds, capsize=4)
+    plt.title("Average Penalty per Round with Standard Deviation")
+    plt.xlabel("Player")
+    plt.ylabel("Points")
+    plt.xticks(rotation=30, ha="right")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "average_scores.png"))
+    plt.close()
+
+    # --- 2. Box plot of penalty distributions, from the histograms ---
+    boxes = []
+    for row in summary:
+        s = stats.players[row["player"]]
+        boxes.append(
+            {
+                "label": row["player"],
+                "med": s.quantile(0.5),
+                "q1": s.quantile(0.25),
+                "q3": s.quantile(0.75),
+                "whislo": s.quantile(0.05),
+                "whishi": s.quantile(0.95),
+                "fliers": [],
+            }
+        )
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.bxp(boxes, showfliers=False)
+    ax.set_title("Penalty Distribution per Player (5-95%)", fontsize=14, fontweight="bold")
+    ax.set_xlabel("Player", fontsize=12)
+    ax.set_ylabel("Points", fontsize=12)
+    plt.xticks(rotation=30, ha="right")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "score_distribution.png"))
+    plt.close()
+
+    # --- 3. Histograms ---
+    plt.figure(figsize=(8, 5))
+    for player in players:
+        s = stats.players[player]
+        plt.step(range(MAX_POINTS + 1), [n / s.count for n in s.hist], where="mid", label=player)
+    plt.title("Penalty Distributions per Player")
+    plt.xlabel("Points")
+    plt.ylabel("Share of rounds")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "score_histogram.png"))
+    plt.close()
+
+    # --- 4. Scatter plot of mean vs std ---
+    plt.figure(figsize=(8, 6))
+    plt.scatter(means, stds, s=100)
+    for player, mean, std in zip(players, means, stds):
+        plt.text(mean, std, player, horizontalalignment="left", size="medium", weight="semibold")
+    plt.title("Player Consistency (Mean vs Std)")
+    plt.xlabel("Mean Penalty")
+    plt.ylabel("Standard Deviation")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "mean_std_scatter.png"))
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player statistics from the results store")
+    parser.add_argument("--results", default=DEFAULT_PATH)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--plots", nargs="?", const="plots", default=None, metavar="DIR")
+    parser.add_argument("--duplicate", action="store_true", help="compare players on duplicate deals")
+    parser.add_argument(
+        "--import-csv", metavar="CSV", help="first add the rounds of an old game_stats.csv to the store"
+    )
+    args = parser.parse_args()
+
+    if args.import_csv:
+        print(f"Imported {import_csv(args.import_csv, args.results)} rows from {args.import_csv}")
+    if args.rebuild and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    stats = update_stats(args.results, args.checkpoint)
+    print(stats.report())
+    if args.plots:
+        plot(stats, args.plots)
+        print(f"Plots saved to {args.plots}/")
+    if args.duplicate:
+        print()
+        print(duplicate_report(args.results))
+
 
-plt.title("Player Consistency (Mean vs Std)")
-plt.xlabel("Mean Score")
-plt.ylabel("Standard Deviation")
-plt.tight_layout()
-plt.savefig("plots/mean_std_scatter.png")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Local stand-in for the OpenAI, Anthropic and Ollama chat endpoints.
+
+Answers the prompts from ``prompt.py`` with a legal card or a guess chosen by
+a configurable policy, after a simulated latency (log-normal around
+``--latency-median``), and injects errors and overload responses at
+configurable rates. Use it to benchmark the harness without API keys:
+
+    python stub_server.py --port 8001 --latency-median 0.8 --overload-rate 0.02
+
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=stub \\
+    ANTHROPIC_BASE_URL=http://localhost:8001 ANTHROPIC_API_KEY=stub \\
+    OLLAMA_HOST=http://localhost:8001 python main.py
+
+``GET /stats`` returns request counts and the injected failures.
+"""
+
+import argparse
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+from card import Rank, Suit, Card
+
+app = Flask(__name__)
+
+config = {
+    "latency_median": 0.5,
+    "latency_sigma": 0.5,
+    "error_rate": 0.0,
+    "overload_rate": 0.0,
+    "invalid_rate": 0.0,
+    "card_policy": "random",
+    "guess_policy": "hand_points",
+}
+counters = {"requests": 0, "errors": 0, "overloads": 0, "invalid": 0}
+_lock = threading.Lock()
+_rng = random.Random()
+
+
+def _count(name):
+    with _lock:
+        counters[name] += 1
+
+
+def _uniform():
+    with _lock:
+        return _rng.random()
+
+
+def _sleep_latency():
+    if config["latency_median"] <= 0:
+        return
+    with _lock:
+        latency = _rng.lognormvariate(
+            math.log(config["latency_median"]), config["latency_sigma"]
+        )
+    time.sleep(latency)
+
+
+def _parse_cards(text):
+    cards = []
+    for name in re.findall(r"([A-Z]+)-([A-Z]+)", text):
+        if name[0] in Rank.__members__ and name[1] in Suit.__members__:
+            cards.append(Card(Suit[name[1]], Rank[name[0]]))
+    return cards
+
+
+def _field(prompt, name):
+    match = re.search(rf"^{name}: (.*)$", prompt, re.MULTILINE)
+    return match.group(1) if match else ""
+
+
+def answer_prompt(prompt):
+    """Answer a guess or card-choice prompt according to the configured policies."""
+    if _uniform() < config["invalid_rate"]:
+        _count("invalid")
+        return "I am not sure."
+    legal = _parse_cards(_field(prompt, "Legal options"))
+    if legal:
+        if config["card_policy"] == "first":
+            card = legal[0]
+        else:
+            with _lock:
+                card = _rng.choice(legal)
+        return f"{card.rank.name}-{card.suit.name}"
+    if config["guess_policy"] == "random":
+        with _lock:
+            return str(_rng.randint(0, 157))
+    if config["guess_policy"] == "hand_points":
+        trump = _field(prompt, "Trump suit")
+        hand = _parse_cards(_field(prompt, "Hand"))
+        if trump in Suit.__members__:
+            return str(sum(c.point_value(Suit[trump]) for c in hand))
+    return str(config["guess_policy"])
+
+
+def _prompt_text(body):
+    parts = []
+    system = body.get("system")
+    if isinstance(system, str):
+        parts.append(system)
+    elif isinstance(system, list):
+        parts.extend(block.get("text", "") for block in system)
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "\n".join(block.get("text", "") for block in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _failure(provider):
+    """Return an error response to inject, or None."""
+    roll = _uniform()
+    if roll < config["overload_rate"]:
+        _count("overloads")
+        if provider == "anthropic":
+            body = {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}
+            return jsonify(body), 529
+        body = {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+        return jsonify(body), 429
+    if roll < config["overload_rate"] + config["error_rate"]:
+        _count("errors")
+        return jsonify({"error": {"message": "Internal error", "type": "api_error"}}), 500
+    return None
+
+
+def _usage(prompt, answer):
+    return (len(prompt) + 3) // 4, (len(answer) + 3) // 4
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def openai_chat():
+    _count("requests")
+    body = request.get_json()
+    _sleep_latency()
+    failure = _failure("openai")
+    if failure:
+        return failure
+    prompt = _prompt_text(body)
+    answer = answer_prompt(prompt)
+    input_tokens, output_tokens = _usage(prompt, answer)
+    return jsonify(
+        {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+    )
+
+
+@app.route("/v1/messages", methods=["POST"])
+def anthropic_messages():
+    _count("requests")
+    body = request.get_json()
+    _sleep_latency()
+    failure = _failure("anthropic")
+    if failure:
+        return failure
+    prompt = _prompt_text(body)
+    answer = answer_prompt(prompt)
+    input_tokens, output_tokens = _usage(prompt, answer)
+    return jsonify(
+        {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": answer}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+    )
+
+
+@app.route("/api/chat", methods=["POST"])
+def ollama_chat():
+    _count("requests")
+    body = request.get_json()
+    _sleep_latency()
+    failure = _failure("ollama")
+    if failure:
+        return failure
+    prompt = _prompt_text(body)
+    answer = answer_prompt(prompt)
+    input_tokens, output_tokens = _usage(prompt, answer)
+    return jsonify(
+        {
+            "model": body.get("model"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": answer},
+            "done": True,
+            "prompt_eval_count": input_tokens,
+            "eval_count": output_tokens,
+        }
+    )
+
+
+@app.route("/stats")
+def stats():
+    with _lock:
+        return jsonify(dict(counters, config=config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub LLM provider server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-median", type=float, default=config["latency_median"])
+    parser.add_argument("--latency-sigma", type=float, default=config["latency_sigma"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--overload-rate", type=float, default=config["overload_rate"])
+    parser.add_argument("--invalid-rate", type=float, default=config["invalid_rate"])
+    parser.add_argument("--card-policy", choices=["random", "first"], default=config["card_policy"])
+    parser.add_argument(
+        "--guess-policy",
+        default=config["guess_policy"],
+        help="random, hand_points or a fixed number",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config.update(
+        {key: value for key, value in vars(args).items() if key in config}
+    )
+    _rng.seed(args.seed)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
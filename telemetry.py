@@ -0,0 +1,289 @@
+"""Per-call LLM telemetry.
+
+Every request an LLM player sends to its provider (cache hits are not
+requests) is traced with the wall latency including rate-limit waits and
+retries, the number of attempts, input and output tokens as reported by the
+provider (the local estimate when it reports none), a cost estimate from
+``PRICES`` and the error if it failed for good. Time to first token is
+only known for Ollama, which reports its prompt evaluation time; the other
+providers are called without streaming. Answers that could not be used and
+were replaced by a random move are recorded as fallbacks.
+
+``get_telemetry()`` is the process-wide instance. It aggregates counters and
+histograms per (provider, model), available as ``summary()``, ``report()``
+and ``prometheus()`` (the text format served on ``/metrics`` by the web app
+when ``JASS_LLM_METRICS`` is set). With ``JASS_LLM_TRACE_PATH`` every trace
+is also appended to that file as one JSON line.
+"""
+
+import atexit
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per million (input, output) tokens, matched by longest model prefix
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o-2024-05-13": (5.00, 15.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "o3-mini": (1.10, 4.40),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "gemma": (0.0, 0.0),
+}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, math.inf)
+
+_current = contextvars.ContextVar("llm_trace", default=None)
+
+
+def price_of(model, prices=PRICES):
+    matches = [prefix for prefix in prices if model and model.startswith(prefix)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def response_usage(response):
+    """(input tokens, output tokens, seconds to first token) of a provider response."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        if hasattr(usage, "prompt_tokens"):
+            return usage.prompt_tokens, usage.completion_tokens, None
+        return usage.input_tokens, usage.output_tokens, None
+    try:
+        # ollama reports durations in nanoseconds
+        ttft = (response.get("load_duration") or 0) + (response.get("prompt_eval_duration") or 0)
+        return response.get("prompt_eval_count"), response.get("eval_count"), ttft / 1e9 or None
+    except AttributeError:
+        return None, None, None
+
+
+def note_response(response):
+    """Add the usage of ``response`` to the trace of the running call, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace["input_tokens"], trace["output_tokens"], trace["ttft"] = response_usage(response)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if n and seen >= q * self.count:
+                return bound
+        return None
+
+
+class Telemetry:
+    def __init__(self, trace_path=None, prices=PRICES):
+        self.trace_path = trace_path
+        self.prices = prices
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._file = open(trace_path, "a") if trace_path else None
+
+    def _metrics(self, provider, model):
+        key = (provider, model)
+        if key not in self.metrics:
+            self.metrics[key] = {
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "fallbacks": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cost": 0.0,
+                "latency": Histogram(LATENCY_BUCKETS),
+                "ttft": Histogram(LATENCY_BUCKETS),
+                "prompt": Histogram(TOKEN_BUCKETS),
+            }
+        return self.metrics[key]
+
+    @contextmanager
+    def call(self, player, kind=None, estimated_tokens=None):
+        """Trace the provider call made inside the ``with`` block."""
+        trace = {
+            "time": time.time(),
+            "provider": player.provider,
+            "model": player.model,
+            "player": str(player),
+            "kind": kind,
+            "attempts": 0,
+            "input_tokens": None,
+            "output_tokens": None,
+            "ttft": None,
+            "error": None,
+        }
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        except Exception as exc:
+            trace["error"] = repr(exc)
+            raise
+        finally:
+            _current.reset(token)
+            trace["latency"] = time.perf_counter() - start
+            if trace["input_tokens"] is None:
+                trace["input_tokens"] = estimated_tokens
+            self.record(trace)
+
+    def record(self, trace):
+        price = price_of(trace["model"], self.prices)
+        trace["cost"] = None
+        if price is not None:
+            trace["cost"] = (
+                (trace["input_tokens"] or 0) * price[0] + (trace["output_tokens"] or 0) * price[1]
+            ) / 1e6
+        with self._lock:
+            m = self._metrics(trace["provider"], trace["model"])
+            m["calls"] += 1
+            m["errors"] += trace["error"] is not None
+            m["retries"] += max(trace["attempts"] - 1, 0)
+            m["input_tokens"] += trace["input_tokens"] or 0
+            m["output_tokens"] += trace["output_tokens"] or 0
+            m["cost"] += trace["cost"] or 0.0
+            m["latency"].observe(trace["latency"])
+            if trace["ttft"] is not None:
+                m["ttft"].observe(trace["ttft"])
+            if trace["input_tokens"] is not None:
+                m["prompt"].observe(trace["input_tokens"])
+            self._write(trace)
+
+    def fallback(self, player, kind, answer):
+        """Record that ``player`` made a random move because ``answer`` was unusable."""
+        with self._lock:
+            self._metrics(player.provider, player.model)["fallbacks"] += 1
+            self._write(
+                {
+                    "time": time.time(),
+                    "event": "fallback",
+                    "provider": player.provider,
+                    "model": player.model,
+                    "player": str(player),
+                    "kind": kind,
+                    "answer": answer,
+                }
+            )
+
+    def _write(self, trace):
+        if self._file is not None:
+            self._file.write(json.dumps(trace) + "\n")
+
+    def summary(self):
+        rows = []
+        with self._lock:
+            for (provider, model), m in sorted(self.metrics.items()):
+                rows.append(
+                    {
+                        "provider": provider,
+                        "model": model,
+                        **{k: v for k, v in m.items() if not isinstance(v, Histogram)},
+                        "latency_mean": m["latency"].sum / m["latency"].count if m["calls"] else None,
+                        "latency_p50": m["latency"].quantile(0.5),
+                        "latency_p95": m["latency"].quantile(0.95),
+                        "ttft_p50": m["ttft"].quantile(0.5),
+                        "prompt_mean": m["prompt"].sum / m["prompt"].count if m["prompt"].count else None,
+                    }
+                )
+        return rows
+
+    def report(self):
+        lines = [
+            f"{'Model':<32} {'Calls':>6} {'Err':>4} {'Retry':>5} {'Fallbk':>6} {'Mean s':>7} "
+            f"{'p50<=':>6} {'p95<=':>6} {'In tok':>8} {'Out tok':>8} {'Cost $':>8}"
+        ]
+        for row in self.summary():
+            mean = "-" if row["latency_mean"] is None else f"{row['latency_mean']:.2f}"
+            lines.append(
+                f"{row['model']:<32} {row['calls']:>6} {row['errors']:>4} {row['retries']:>5} "
+                f"{row['fallbacks']:>6} {mean:>7} {row['latency_p50'] or '-':>6} "
+                f"{row['latency_p95'] or '-':>6} {row['input_tokens']:>8} {row['output_tokens']:>8} "
+                f"{row['cost']:>8.4f}"
+            )
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        counters = {
+            "calls": "jass_llm_calls_total",
+            "errors": "jass_llm_errors_total",
+            "retries": "jass_llm_retries_total",
+            "fallbacks": "jass_llm_fallbacks_total",
+            "input_tokens": "jass_llm_input_tokens_total",
+            "output_tokens": "jass_llm_output_tokens_total",
+            "cost": "jass_llm_cost_usd_total",
+        }
+        histograms = {
+            "latency": "jass_llm_latency_seconds",
+            "ttft": "jass_llm_ttft_seconds",
+            "prompt": "jass_llm_prompt_tokens",
+        }
+        lines = []
+        with self._lock:
+            items = sorted(self.metrics.items())
+            for key, name in counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for (provider, model), m in items:
+                    lines.append(f'{name}{{provider="{provider}",model="{model}"}} {m[key]}')
+            for key, name in histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for (provider, model), m in items:
+                    labels = f'provider="{provider}",model="{model}"'
+                    hist = m[key]
+                    seen = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        seen += n
+                        le = "+Inf" if bound == math.inf else bound
+                        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {seen}')
+                    lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Process-wide ``Telemetry``, tracing to ``JASS_LLM_TRACE_PATH`` if set."""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry(os.getenv("JASS_LLM_TRACE_PATH"))
+            atexit.register(_telemetry.close)
+        return _telemetry
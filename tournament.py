@@ -0,0 +1,182 @@
+"""Parallel tournament runner.
+
+Every game gets freshly built players (from ``PlayerSpec``s) and its own
+seed, so games are independent and can run side by side: in a process pool
+for CPU-bound bot games, or in a thread pool when the seats are LLM players
+that mostly wait on HTTP. Results are merged into the stats csv and the
+results store by the parent process as games finish.
+
+In duplicate mode every game is played at one table per seat rotation with
+the same seeded deals (deck order and trump), so each player holds every
+hand once and card luck cancels out in the comparisons of
+``stats.py --duplicate``.
+"""
+
+import csv
+import inspect
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from game import DifferenzlerGame
+from player import LLMPlayer
+from profiling import GameProfiler
+from results_store import DEFAULT_PATH, get_results_store
+
+
+class PlayerSpec:
+    """Recipe for a player: the class plus its constructor arguments."""
+
+    def __init__(self, player_class, *args, **kwargs):
+        self.player_class = player_class
+        self.args = args
+        self.kwargs = kwargs
+
+    def build(self, seed=None):
+        player = self.player_class(*self.args, **self.kwargs)
+        player.rng.seed(seed)
+        return player
+
+    def name(self):
+        """The built player's ``str``. LLM players are named from the arguments
+        ("<label> <model>") instead of built, which would set up their clients."""
+        if not hasattr(self.player_class, "label"):
+            return str(self.build())
+        arguments = inspect.signature(self.player_class).bind(*self.args, **self.kwargs)
+        arguments.apply_defaults()
+        _, model = arguments.arguments.values()
+        return f"{self.player_class.label} {model}"
+
+    def is_io_bound(self):
+        return issubclass(self.player_class, LLMPlayer)
+
+    def __repr__(self):
+        kwargs = f", {self.kwargs}" if self.kwargs else ""
+        return f"PlayerSpec({self.player_class.__name__}, {self.args}{kwargs})"
+
+
+def game_seeds(seed, n_games):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(n_games)]
+
+
+def rotations(specs):
+    """The seat orders of a duplicate game, one per table; each spec holds every seat once."""
+    return [specs[k:] + specs[:k] for k in range(len(specs))]
+
+
+def play_game(specs, n_rounds, seed, verbose=False, deals=None, profile=None):
+    """Build the players for one game, play it and return its stats rows, result
+    rows, the API usage of its LLM players (player -> calls and tokens) and its
+    ``GameProfiler`` if ``profile`` (the profiler's options) is given.
+
+    Every player is seeded from the game seed and its spec, not its seat, so a
+    player makes the same random choices in every seat rotation of a game."""
+    profiler = None if profile is None else GameProfiler(**profile)
+    players = [spec.build(player_seed(seed, spec, specs[:i])) for i, spec in enumerate(specs)]
+    game = DifferenzlerGame(
+        players,
+        n_rounds=n_rounds,
+        seed=random.Random(seed).getrandbits(64),
+        stats_file=None,
+        verbose=verbose,
+        deals=deals,
+        profiler=profiler,
+    )
+    game.play_game()
+    usage = {str(p): p.usage for p in players if hasattr(p, "usage")}
+    return game.stats_rows, game.result_rows, usage, profiler
+
+
+def player_seed(seed, spec, earlier_specs=()):
+    """Seed of ``spec``'s player in the game with ``seed``; ``earlier_specs`` tells
+    identical specs at one table apart."""
+    if seed is None:
+        return None
+    copy = sum(repr(other) == repr(spec) for other in earlier_specs)
+    return random.Random(f"{seed}:{spec!r}:{copy}").getrandbits(64)
+
+
+def _silence_worker():
+    sys.stdout = open(os.devnull, "w")
+
+
+def run_tournament(
+    specs,
+    n_games,
+    n_rounds=1,
+    seed=None,
+    executor=None,
+    max_workers=None,
+    stats_file="game_stats.csv",
+    verbose=False,
+    results_path=DEFAULT_PATH,
+    ratings=None,
+    duplicate=False,
+    on_game=None,
+    profiler=None,
+):
+    """Play ``n_games`` games in parallel and append their rows to ``stats_file``
+    and to the results store at ``results_path`` (None to skip either).
+
+    ``executor`` is ``"process"`` or ``"thread"``; by default a thread pool is
+    used as soon as one seat is an LLM player. If ``ratings`` (a
+    ``ratings.Ratings``) is given it is updated with every game as it finishes;
+    the players then need distinct names.
+    With ``duplicate`` every game is played at all seat rotations of ``specs``
+    with the same deals, i.e. as ``len(specs)`` tables. Returns the rows of all
+    tables in game order. ``on_game`` is called with the result rows and the
+    API usage of every table as it finishes. Per-phase timings of all games are
+    added to ``profiler`` (a ``profiling.GameProfiler``) if given.
+    """
+    if ratings is not None:
+        names = [spec.name() for spec in specs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Players need distinct names: {names}")
+    profile = None if profiler is None else profiler.options()
+    jobs = []
+    for game_seed in game_seeds(seed, n_games):
+        if duplicate:
+            deals = game_seeds(game_seed, n_rounds)
+            jobs.extend(
+                (table, n_rounds, game_seed, verbose, deals, profile) for table in rotations(specs)
+            )
+        else:
+            jobs.append((specs, n_rounds, game_seed, verbose, None, profile))
+
+    if not jobs:
+        return []
+    if executor is None:
+        executor = "thread" if any(spec.is_io_bound() for spec in specs) else "process"
+    if executor == "process":
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=None if verbose else _silence_worker
+        )
+    elif executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers or min(32, len(jobs)))
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+
+    store = None if results_path is None else get_results_store(results_path)
+    results = [None] * len(jobs)
+    with pool:
+        futures = {pool.submit(play_game, *job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            rows, result_rows, usage, game_profiler = future.result()
+            results[futures[future]] = rows
+            if store is not None:
+                store.add(result_rows)
+            if ratings is not None:
+                ratings.add_result_rows(result_rows)
+            if on_game is not None:
+                on_game(result_rows, usage)
+            if game_profiler is not None:
+                profiler.merge(game_profiler)
+            if stats_file is not None:
+                with open(stats_file, "a") as csvfile:
+                    csv.writer(csvfile).writerows(rows)
+            print(f"Game {done}/{len(jobs)} complete ({rows[-1][0]})")
+    if store is not None:
+        store.flush()
+    return [row for rows in results for row in rows]
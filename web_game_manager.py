@@ -1,274 +1,531 @@
+import asyncio
+import json
+import os
+import resource
+import time
+import traceback
 import uuid
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 from card import Card, Suit, Rank
+from event_log import SCORE
+from async_player import make_guess, play_card
+
+# Seconds the client should wait after showing an event before the next one.
+# The server never sleeps; it sends these as 'pause_ms' and the client paces
+# the table itself.
+PAUSE_AFTER_CARD = 1
+PAUSE_AFTER_TRICK = 2
+PAUSE_AFTER_ROUND = 2
+
+# Game states: waiting_to_start -> playing -> finished or abandoned. Ended
+# games keep only a small record until they are evicted.
+WAITING_TO_START = 'waiting_to_start'
+PLAYING = 'playing'
+FINISHED = 'finished'
+ABANDONED = 'abandoned'
+FAILED = 'failed'  # a player or the game raised
+ENDED = (FINISHED, ABANDONED, FAILED)
+
+
+class GameAbandoned(Exception):
+    pass
+
 
 class WebGameManager:
-    def __init__(self):
+    """Runs web games as tasks on one asyncio loop thread.
+
+    Waiting for a human is an awaited future and blocking (LLM) players run
+    in a bounded thread pool, so an open table costs no thread of its own.
+    At most ``max_games`` games run at once; ``create_game`` returns None
+    when the server is full.
+
+    Ended games drop their players and game state at once and are evicted
+    ``ttl`` seconds later, their records appended to
+    ``archive_dir/games.jsonl`` if an archive directory is given.
+    """
+    
+    def __init__(
+        self,
+        human_timeout: Optional[float] = None,
+        on_timeout: str = 'auto',
+        max_games: int = 1000,
+        max_workers: int = 32,
+        ttl: float = 300,
+        archive_dir: Optional[str] = None,
+    ):
         self.games: Dict[str, dict] = {}
         self.player_sessions: Dict[str, str] = {}  # session_id -> game_id
         self.locks: Dict[str, threading.Lock] = {}
-        
+        # guards adding and evicting entries of games and locks
+        self._games_lock = threading.Lock()
+        # seconds a human may take per action (None: no limit); on timeout
+        # 'auto' plays a card (or guesses) for them, 'abandon' ends the game
+        self.human_timeout = human_timeout
+        self.on_timeout = on_timeout
+        self.max_games = max_games
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='web-player')
+        self.ttl = ttl
+        self.archive_dir = archive_dir
+        self.counters = {
+            'started': 0, 'finished': 0, 'abandoned': 0, 'failed': 0, 'rejected': 0,
+            'evicted': 0, 'archived': 0,
+        }
+        self.loop = None
+        self._loop_lock = threading.Lock()
+    
+    def _get_loop(self):
+        with self._loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self.loop.run_forever, name='web-games', daemon=True
+                )
+                thread.start()
+                self.loop.call_soon_threadsafe(self._schedule_eviction)
+            return self.loop
+    
+    def active_games(self):
+        return sum(
+            1 for data in list(self.games.values())
+            if data['status'] in (WAITING_TO_START, PLAYING)
+        )
+    
     def create_game(self, game, human_player):
+        """Register a game, or return None if ``max_games`` games are running"""
         game_id = str(uuid.uuid4())
-        self.games[game_id] = {
+        game_data = {
             'game': game,
             'human_player': human_player,
             'waiting_for_human': False,
             'human_action_type': None,  # 'guess' or 'play_card'
             'human_action_data': None,
-            'status': 'waiting_to_start'
+            'human_action': None,  # future resolved when the human acted
+            'pending_pause': 0,  # pacing the client shows before the next request
+            'task': None,
+            'status': WAITING_TO_START,
+            'created_at': time.time(),
+            'ended_at': None,
+            'record': None,
         }
+        # checked and inserted under one lock so concurrent creates keep the cap
+        with self._games_lock:
+            if self.active_games() >= self.max_games:
+                self.counters['rejected'] += 1
+                return None
+            self.locks[game_id] = threading.Lock()
+            self.games[game_id] = game_data
         self.player_sessions[human_player.session_id] = game_id
-        self.locks[game_id] = threading.Lock()
         return game_id
     
+    def _get_game(self, game_id):
+        """The game's data and lock, or (None, None) once it is evicted"""
+        with self._games_lock:
+            return self.games.get(game_id), self.locks.get(game_id)
+    
     def remove_player(self, session_id):
         if session_id in self.player_sessions:
             game_id = self.player_sessions[session_id]
             del self.player_sessions[session_id]
             if game_id in self.games:
-                # Mark game as abandoned
-                self.games[game_id]['status'] = 'abandoned'
+                self.cancel_game(game_id)
+    
+    def cancel_game(self, game_id):
+        """Abandon a game and stop its game loop"""
+        game_data, lock = self._get_game(game_id)
+        if game_data is None or game_data['status'] in ENDED:
+            return
+        with lock:
+            if game_data['status'] == WAITING_TO_START:
+                self._end_game(game_id, ABANDONED)
+                return
+            game_data['status'] = ABANDONED
+            self._resolve(game_data, None)
+        # stops at the next await; a blocking player call still finishes
+        # read once: _end_game on the loop thread may clear it meanwhile
+        task = game_data['task']
+        if task is not None:
+            task.cancel()
     
     def start_game(self, game_id, socketio):
+        """Schedule the game on the loop thread and return its future"""
         if game_id not in self.games:
-            return
+            return None
         
         game_data = self.games[game_id]
-        game = game_data['game']
-        human_player = game_data['human_player']
-        
-        game_data['status'] = 'playing'
+        game_data['task'] = asyncio.run_coroutine_threadsafe(
+            self._run_game(game_id, socketio), self._get_loop()
+        )
+        return game_data['task']
+    
+    async def _run_game(self, game_id, socketio):
+        game_data = self.games[game_id]
+        if game_data['status'] != WAITING_TO_START:
+            return
+        game_data['status'] = PLAYING
+        self.counters['started'] += 1
         
         # Override the game's play_game method to handle web interactions
-        self._play_web_game(game, game_id, socketio)
+        try:
+            await self._play_web_game(game_data['game'], game_id, socketio)
+        except (GameAbandoned, asyncio.CancelledError):
+            self._end_game(game_id, ABANDONED)
+            print(f'Game {game_id} abandoned')
+            return
+        except Exception:
+            # e.g. a provider error that is not retried: end the game so it
+            # frees its slot and can be evicted, and tell the player
+            print(f'Game {game_id} failed:')
+            traceback.print_exc()
+            self._emit(socketio, game_id, 'error', {
+                'message': 'The game stopped because of a server error, please start a new one'
+            })
+            self._end_game(game_id, FAILED)
+            return
+        self._end_game(game_id, FINISHED)
     
-    def _play_web_game(self, game, game_id, socketio):
+    def _end_game(self, game_id, status):
+        """Keep a small record of an ended game and release everything else"""
+        game_data = self.games[game_id]
+        if game_data['ended_at'] is not None:
+            return
+        game = game_data['game']
+        game_data['status'] = status
+        game_data['ended_at'] = time.time()
+        game_data['record'] = {
+            'game_id': game_id,
+            'status': status,
+            'created_at': game_data['created_at'],
+            'ended_at': game_data['ended_at'],
+            'rounds_played': game.rounds_played,
+            'n_rounds': game.n_rounds,
+            'scores': {str(player): player.points for player in game.players},
+        }
+        # players hold their LLM clients and hands
+        game_data['game'] = None
+        game_data['human_player'] = None
+        game_data['human_action'] = None
+        game_data['waiting_for_human'] = False
+        game_data['task'] = None
+        self.counters[status] += 1
+    
+    def _schedule_eviction(self):
+        interval = max(1, min(self.ttl / 2, 60))
+        self.loop.call_later(interval, self._evict_ended_games)
+    
+    def _evict_ended_games(self):
+        """Drop games that ended more than ``ttl`` seconds ago"""
+        try:
+            cutoff = time.time() - self.ttl
+            evicted = [
+                game_id for game_id, data in list(self.games.items())
+                if data['ended_at'] is not None and data['ended_at'] < cutoff
+            ]
+            records = []
+            with self._games_lock:
+                for game_id in evicted:
+                    records.append(self.games.pop(game_id)['record'])
+                    self.locks.pop(game_id, None)
+            if evicted:
+                evicted_ids = set(evicted)
+                for session_id, game_id in list(self.player_sessions.items()):
+                    if game_id in evicted_ids:
+                        self.player_sessions.pop(session_id, None)
+                self.counters['evicted'] += len(evicted)
+                if self.archive_dir:
+                    self.loop.run_in_executor(self.executor, self._archive, records)
+        finally:
+            self._schedule_eviction()
+    
+    def _archive(self, records):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(os.path.join(self.archive_dir, 'games.jsonl'), 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        self.counters['archived'] += len(records)
+    
+    def _emit(self, socketio, game_id, event, data, pause=0):
+        data['pause_ms'] = int(pause * 1000)
+        self.games[game_id]['pending_pause'] += pause
+        socketio.emit(event, data, room=game_id)
+    
+    async def _play_web_game(self, game, game_id, socketio):
         """Modified version of play_game that handles web interactions"""
         for round_num in range(game.n_rounds):
-            self._play_web_round(game, game_id, socketio, round_num + 1)
+            await self._play_web_round(game, game_id, socketio, round_num + 1)
             game.rounds_played += 1
             
             # Send round results to client
-            socketio.emit('round_complete', {
+            self._emit(socketio, game_id, 'round_complete', {
                 'round': round_num + 1,
                 'scores': {str(player): player.points for player in game.players}
-            }, room=game_id)
-            
-            time.sleep(2)  # Brief pause between rounds
+            }, PAUSE_AFTER_ROUND)
         
         # Game complete
         final_scores = {str(player): player.points for player in game.players}
         winner = min(game.players, key=lambda p: p.points)
         
-        socketio.emit('game_complete', {
+        self._emit(socketio, game_id, 'game_complete', {
             'final_scores': final_scores,
             'winner': str(winner)
-        }, room=game_id)
+        })
     
-    def _play_web_round(self, game, game_id, socketio, round_num):
+    async def _play_web_round(self, game, game_id, socketio, round_num):
         """Modified version of play_round that handles web interactions"""
         game.setup_round()
         game.deal_cards()
         
         # Send round start info to client
         human_player = self.games[game_id]['human_player']
-        socketio.emit('round_start', {
+        self._emit(socketio, game_id, 'round_start', {
             'round': round_num,
             'trump_suit': game.trump_suit.name,
             'hand': self._serialize_cards(human_player.hand)
-        }, room=game_id)
+        })
         
         # Collect guesses (including from human player)
-        self._collect_web_guesses(game, game_id, socketio)
+        await self._collect_web_guesses(game, game_id, socketio)
         
         # Play tricks
         player_order = game.players[:]
         for trick_num in range(game.N_TRICKS):
-            winner = self._play_web_trick(game, game_id, socketio, player_order, trick_num + 1)
-            
-            # Update player order for next trick
-            winner_index = player_order.index(winner)
-            player_order = player_order[winner_index:] + player_order[:winner_index]
+            player_order = await self._play_web_trick(game, game_id, socketio, player_order, trick_num + 1)
         
         game.score_players()
         
         # Send round results with guess vs actual comparisons
+        guesses = game.log.guesses()
         round_results = []
-        for player in game.players:
-            total_points = sum(
-                card.point_value(game.trump_suit)
-                for trick in player.tricks_won
-                for card in trick
-            )
-            diff = abs(player.guess - total_points)
+        for seat, total_points in game.log.events(SCORE):
             round_results.append({
-                'player': str(player),
-                'guess': player.guess,
+                'player': game.log.names[seat],
+                'guess': guesses[seat],
                 'actual': total_points,
-                'difference': diff
+                'difference': abs(guesses[seat] - total_points)
             })
         
-        socketio.emit('round_guess_results', {
+        self._emit(socketio, game_id, 'round_guess_results', {
             'results': round_results,
             'round_data': {
                 'round': round_num,
                 'scores': {str(player): player.points for player in game.players}
             }
-        }, room=game_id)
+        })
     
-    def _collect_web_guesses(self, game, game_id, socketio):
+    async def _collect_web_guesses(self, game, game_id, socketio):
         """Collect guesses from all players, handling human player via web"""
         human_player = self.games[game_id]['human_player']
         
         # Request guess from human player
-        socketio.emit('request_guess', {
+        self._emit(socketio, game_id, 'request_guess', {
             'trump_suit': game.trump_suit.name,
             'hand': self._serialize_cards(human_player.hand)
-        }, room=game_id)
-        
-        # Wait for human guess
-        self._wait_for_human_action(game_id, 'guess')
+        })
         
-        # Collect guesses from AI players (but don't show them yet)
+        # Collect guesses from AI players (but don't show them yet) while the
+        # human thinks
+        await asyncio.gather(
+            self._wait_for_human_action(game_id, 'guess'),
+            *(
+                make_guess(player, game, self.executor)
+                for player in game.players
+                if player != human_player
+            ),
+        )
         for player in game.players:
-            if player != human_player:
-                player.make_guess(game)
+            game.record_guess(player)
     
-    def _play_web_trick(self, game, game_id, socketio, player_order, trick_num):
+    async def _play_web_trick(self, game, game_id, socketio, player_order, trick_num):
         """Play a single trick with web interaction"""
-        trick = []
-        game.leading_suit = None
+        trick = game.start_trick()
         human_player = self.games[game_id]['human_player']
         
-        socketio.emit('trick_start', {
+        self._emit(socketio, game_id, 'trick_start', {
             'trick_number': trick_num,
             'player_order': [str(p) for p in player_order]
-        }, room=game_id)
+        })
         
         for player in player_order:
             if player == human_player:
                 # Request card from human player
                 legal_cards = game.get_legal_cards(player.hand, game.leading_suit)
-                socketio.emit('request_card', {
+                self._emit(socketio, game_id, 'request_card', {
                     'legal_cards': self._serialize_cards(legal_cards),
                     'current_trick': self._serialize_trick(trick),
                     'leading_suit': game.leading_suit.name if game.leading_suit else None
-                }, room=game_id)
+                })
                 
                 # Wait for human card selection
-                self._wait_for_human_action(game_id, 'play_card')
-                
-                # Get the selected card
-                card_data = self.games[game_id]['human_action_data']
+                card_data = await self._wait_for_human_action(game_id, 'play_card')
                 card = self._deserialize_card(card_data['suit'], card_data['rank'])
                 player.hand.remove(card)
             else:
                 # AI player
-                card = player.play_card(game)
-            
-            if not game.leading_suit:
-                game.leading_suit = card.suit
+                card = await play_card(player, game, self.executor)
             
-            trick.append((player, card))
+            game.record_play(trick, player, card)
             
             # Broadcast card play
-            socketio.emit('card_played', {
+            self._emit(socketio, game_id, 'card_played', {
                 'player': str(player),
                 'card': self._serialize_card(card),
                 'trick': self._serialize_trick(trick)
-            }, room=game_id)
-            
-            time.sleep(1)  # Brief pause between cards
-        
-        # Determine winner
-        winner = game.determine_trick_winner(trick)
-        winner.tricks_won.append([card for _, card in trick])
+            }, PAUSE_AFTER_CARD)
         
-        # Update game state
-        game.played_cards.extend(card for _, card in trick)
-        game.n_tricks_played += 1
+        # Determine winner and update game state
+        player_order = game.finish_trick(trick, player_order)
+        winner = player_order[0]
         
         # Add extra 5 points for last trick
-        if game.n_tricks_played == game.N_TRICKS:
-            winner.points += 5
-            socketio.emit('card_played', {
+        if game.last_trick_winner is winner:
+            self._emit(socketio, game_id, 'last_trick_bonus', {
                 'player': str(winner),
-                'card': None,
                 'message': f'{winner} gets 5 extra points for the last trick!'
-            }, room=game_id)
+            })
         
-        socketio.emit('trick_complete', {
+        self._emit(socketio, game_id, 'trick_complete', {
             'winner': str(winner),
             'trick': self._serialize_trick(trick)
-        }, room=game_id)
+        }, PAUSE_AFTER_TRICK)
         
-        time.sleep(2)  # Pause before next trick
-        
-        return winner
+        return player_order
     
-    def _wait_for_human_action(self, game_id, action_type):
-        """Wait for human player to take an action"""
+    async def _wait_for_human_action(self, game_id, action_type):
+        """Wait for human player to take an action and return its data"""
         game_data = self.games[game_id]
-        game_data['waiting_for_human'] = True
-        game_data['human_action_type'] = action_type
-        game_data['human_action_data'] = None
+        action = asyncio.get_running_loop().create_future()
+        with self.locks[game_id]:
+            game_data['human_action'] = action
+            game_data['human_action_type'] = action_type
+            game_data['human_action_data'] = None
+            game_data['waiting_for_human'] = game_data['status'] != ABANDONED
+            # the client first shows the events queued before the request
+            timeout = self.human_timeout
+            if timeout is not None:
+                timeout += game_data['pending_pause']
+            game_data['pending_pause'] = 0
         
-        # Poll until action is received
-        while game_data['waiting_for_human'] and game_data['status'] != 'abandoned':
-            time.sleep(0.1)
+        # handle_guess/handle_card_play (or remove_player) resolve the future
+        if game_data['waiting_for_human']:
+            try:
+                await asyncio.wait_for(action, timeout)
+            except asyncio.TimeoutError:
+                pass
+        with self.locks[game_id]:
+            game_data['human_action'] = None
+            if game_data['waiting_for_human']:
+                # timed out
+                game_data['waiting_for_human'] = False
+                if self.on_timeout == 'auto':
+                    game_data['human_action_data'] = self._auto_action(game_data, action_type)
+                else:
+                    game_data['status'] = ABANDONED
+            if game_data['status'] == ABANDONED:
+                raise GameAbandoned(game_id)
+            return game_data['human_action_data']
+    
+    def _resolve(self, game_data, data):
+        """Wake the game loop waiting for the human; call with the game's lock held"""
+        action = game_data['human_action']
+        if action is not None:
+            action.get_loop().call_soon_threadsafe(
+                lambda: action.done() or action.set_result(data)
+            )
+    
+    def _auto_action(self, game_data, action_type):
+        """Act for a human who ran out of time"""
+        player = game_data['human_player']
+        game = game_data['game']
+        if action_type == 'guess':
+            player.guess = sum(card.point_value(game.trump_suit) for card in player.hand)
+            return {'guess': player.guess}
+        card = player.rng.choice(game.get_legal_cards(player.hand, game.leading_suit))
+        return {'suit': card.suit.name, 'rank': card.rank.name}
+    
+    def metrics(self):
+        """Counts of games by state and of the work behind them"""
+        games = list(self.games.values())
+        by_status = dict.fromkeys((WAITING_TO_START, PLAYING, *ENDED), 0)
+        for data in games:
+            by_status[data['status']] += 1
+        return {
+            'active_games': self.active_games(),
+            'max_games': self.max_games,
+            'games_by_status': by_status,
+            'waiting_for_human': sum(1 for data in games if data['waiting_for_human']),
+            'games_in_memory': len(games),
+            'players_connected': len(self.player_sessions),
+            'worker_threads': self.executor._max_workers,
+            'worker_backlog': self.executor._work_queue.qsize(),
+            'memory': self.memory_usage(),
+            **self.counters,
+        }
+    
+    def memory_usage(self):
+        """Resident and peak memory of the server process in MiB"""
+        usage = {'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        try:
+            with open('/proc/self/statm') as f:
+                pages = int(f.read().split()[1])
+            usage['rss_mib'] = round(pages * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+        except OSError:
+            pass
+        return usage
     
     def handle_guess(self, game_id, session_id, guess):
         """Handle guess from human player"""
-        if game_id not in self.games:
+        game_data, lock = self._get_game(game_id)
+        if game_data is None:
             return False
         
-        game_data = self.games[game_id]
-        if (game_data['waiting_for_human'] and 
-            game_data['human_action_type'] == 'guess' and
-            game_data['human_player'].session_id == session_id):
-            
-            # Validate guess
-            if not (0 <= guess <= 157):
-                return False
-            
-            game_data['human_player'].guess = guess
-            game_data['waiting_for_human'] = False
-            game_data['human_action_data'] = {'guess': guess}
-            return True
+        with lock:
+            if (game_data['waiting_for_human'] and
+                game_data['human_action_type'] == 'guess' and
+                game_data['human_player'].session_id == session_id):
+                
+                # Validate guess
+                if not (0 <= guess <= 157):
+                    return False
+                
+                game_data['human_player'].guess = guess
+                game_data['waiting_for_human'] = False
+                game_data['human_action_data'] = {'guess': guess}
+                self._resolve(game_data, game_data['human_action_data'])
+                return True
         
         return False
     
     def handle_card_play(self, game_id, session_id, card_suit, card_rank):
         """Handle card play from human player"""
-        if game_id not in self.games:
+        game_data, lock = self._get_game(game_id)
+        if game_data is None:
             return False
         
-        game_data = self.games[game_id]
-        if (game_data['waiting_for_human'] and 
-            game_data['human_action_type'] == 'play_card' and
-            game_data['human_player'].session_id == session_id):
-            
-            # Validate card is in hand and legal
-            try:
-                card = self._deserialize_card(card_suit, card_rank)
-                player = game_data['human_player']
-                game = game_data['game']
+        with lock:
+            if (game_data['waiting_for_human'] and
+                game_data['human_action_type'] == 'play_card' and
+                game_data['human_player'].session_id == session_id):
                 
-                if card not in player.hand:
+                # Validate card is in hand and legal
+                try:
+                    card = self._deserialize_card(card_suit, card_rank)
+                    player = game_data['human_player']
+                    game = game_data['game']
+                    
+                    if card not in player.hand:
+                        return False
+                    
+                    legal_cards = game.get_legal_cards(player.hand, game.leading_suit)
+                    if card not in legal_cards:
+                        return False
+                    
+                    game_data['waiting_for_human'] = False
+                    game_data['human_action_data'] = {'suit': card_suit, 'rank': card_rank}
+                    self._resolve(game_data, game_data['human_action_data'])
+                    return True
+                except:
                     return False
-                
-                legal_cards = game.get_legal_cards(player.hand, game.leading_suit)
-                if card not in legal_cards:
-                    return False
-                
-                game_data['waiting_for_human'] = False
-                game_data['human_action_data'] = {'suit': card_suit, 'rank': card_rank}
-                return True
-            except:
-                return False
         
         return False
     
@@ -298,4 +555,4 @@ class WebGameManager:
         """Convert JSON data back to Card object"""
         suit = Suit[suit_name]
         rank = Rank[rank_name]
-        return Card(suit, rank) 
\ No newline at end of file
+        return Card(suit, rank)